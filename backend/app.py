@@ -1,14 +1,17 @@
 # app.py - Main application file
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from openai import OpenAI
 import logging
 import json
 import os
 from dotenv import load_dotenv
 from init_db import init_db
+from utils.rate_limit import limiter, GENERATION_COST
+from utils.llm_cache import llm_cache, LLM_CACHE_CLEANUP_INTERVAL
+from utils.llm_streaming import relay_completion, stream_stats
+from utils.health import health_prober, mysql_check, http_check
+from utils.tokens_utils import role_required
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -20,13 +23,14 @@ load_dotenv()
 # Configuration
 class Config:
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
+    LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1')
     SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
-    RATE_LIMIT = "30/minute"
     DEFAULT_MODEL = "deepseek/deepseek-r1-0528:free"
     DB_HOST = os.getenv('DB_HOST')
     DB_USER = os.getenv('DB_USER')
     DB_PASSWORD = os.getenv('DB_PASSWORD')
     DB_NAME = os.getenv('DB_NAME')
+    CACHE_URL = os.getenv('CACHE_URL', 'memory://')
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -44,58 +48,82 @@ CORS(app, resources={
             "X-Requested-With"
         ],
         "supports_credentials": True,
-        "expose_headers": ["Content-Length"],
+        "expose_headers": [
+            "Content-Length", "ETag", "Retry-After",
+            "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"
+        ],
         "max_age": 86400
     }
 })
 
 # Initialize OpenRouter client
 client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+    base_url=app.config['LLM_BASE_URL'],
     api_key=app.config['OPENROUTER_API_KEY'],
 )
 
-# Rate limiting
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    storage_uri="memory://",
-    default_limits=[app.config['RATE_LIMIT']]
-)
+# Rate limiting (per user or IP, shared across workers via CACHE_URL)
+limiter.init_app(app)
 
 # Initialize Database
 init_db()
 
-def verify_openrouter_key():
-    """Verify OpenRouter API key is valid."""
-    try:
-        response = client.chat.completions.create(
-            model=app.config['DEFAULT_MODEL'],
-            messages=[{"role": "user", "content": "Ping"}],
-            max_tokens=1,
-            extra_headers={
-                "HTTP-Referer": "http://localhost:5000",
-                "X-Title": "API Health Check"
-            }
-        )
-        return True
-    except Exception as e:
-        logger.error(f"OpenRouter key verification failed: {e}")
-        return False
+# Health checks, answered from the background prober's snapshot
+@app.route('/health/live', methods=['GET'])
+@limiter.exempt
+def health_live():
+    """The process is up and serving requests"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+@limiter.exempt
+def health_ready():
+    """Dependencies needed to serve traffic answered the last probe"""
+    snapshot = health_prober.snapshot()
+    return jsonify(snapshot), 200 if snapshot['ready'] else 503
 
-# Health check endpoint
 @app.route('/health', methods=['GET'])
+@limiter.exempt
 def health_check():
+    snapshot = health_prober.snapshot()
+    openrouter = snapshot['checks'].get('openrouter', {}).get('status')
     return jsonify({
-        "status": "healthy",
+        "status": "healthy" if snapshot['ready'] else "unhealthy",
         "services": {
-            "openrouter": "connected" if verify_openrouter_key() else "invalid_key"
+            "openrouter": "connected" if openrouter == 'up' else "invalid_key"
         }
     })
 
+# Cache and verification metrics (admins only: they reveal traffic and cache contents)
+@app.route('/metrics', methods=['GET'])
+@role_required(['admin'])
+def metrics():
+    from utils.cache import response_cache
+    from utils.tokens_utils import token_verifier
+    from utils.user_directory import user_directory
+    from utils.password_hashing import password_hasher
+    from utils.token_store import token_store
+    from utils.answer_keys import answer_keys
+    from utils.score_histogram import score_distributions
+    return jsonify({
+        "response_cache": response_cache.stats(),
+        "token_verifier": token_verifier.stats(),
+        "user_directory": user_directory.stats(),
+        "password_hasher": password_hasher.stats(),
+        "refresh_tokens": token_store.stats(),
+        "rate_limiter": limiter.stats(),
+        "answer_keys": answer_keys.stats(),
+        "score_distributions": score_distributions.stats(),
+        "quiz_jobs": quiz_jobs.stats(),
+        "question_stock": question_stock.stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_streams": stream_stats.stats(),
+        "jobs": job_stats()
+    })
+
 # AI generation endpoint
 @app.route('/api/generate', methods=['POST'])
-@limiter.limit(app.config['RATE_LIMIT'])
+@limiter.cost(GENERATION_COST)
 def generate_content():
     """
     Generate content using OpenRouter.ai
@@ -104,7 +132,9 @@ def generate_content():
         "prompt": "Your question here",
         "model": "openai/gpt-4o" (optional),
         "temperature": 0.7 (optional),
-        "json_mode": true (optional)
+        "json_mode": true (optional),
+        "cache": false (optional, skip the response cache for a fresh sample),
+        "stream": true (optional, answer as text/event-stream; see utils/llm_streaming.py)
     }
     """
     try:
@@ -114,24 +144,47 @@ def generate_content():
 
         # Configure response format
         response_format = {"type": "json_object"} if data.get("json_mode", False) else None
+        model = data.get("model", app.config['DEFAULT_MODEL'])
+        messages = [{"role": "user", "content": data['prompt']}]
+        temperature = max(0.0, min(float(data.get("temperature", 0.7)), 1.0))
+        extra_headers = {
+            "HTTP-Referer": "http://yourdomain.com",
+            "X-Title": "Quiz API"
+        }
 
-        # Generate with OpenRouter
-        response = client.chat.completions.create(
-            model=data.get("model", app.config['DEFAULT_MODEL']),
-            messages=[{"role": "user", "content": data['prompt']}],
-            temperature=min(max(float(data.get("temperature", 0.7)), 1.0),
-            max_tokens=data.get("max_tokens", 1024),
+        if data.get("stream", False):
+            # Relay tokens as Server-Sent Events while they are generated
+            return Response(
+                relay_completion(
+                    client,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format=response_format,
+                    max_tokens=data.get("max_tokens", 1024),
+                    extra_headers=extra_headers
+                ),
+                mimetype='text/event-stream',
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        # Generate with OpenRouter (identical requests are answered from cache)
+        content, cached = llm_cache.complete(
+            client,
+            model=model,
+            messages=messages,
+            temperature=temperature,
             response_format=response_format,
-            extra_headers={
-                "HTTP-Referer": "http://yourdomain.com",
-                "X-Title": "Quiz API"
-            }
-        ))
+            cache=bool(data.get("cache", True)),
+            max_tokens=data.get("max_tokens", 1024),
+            extra_headers=extra_headers
+        )
 
         return jsonify({
-            "result": response.choices[0].message.content,
-            "model": data.get("model", app.config['DEFAULT_MODEL']),
-            "provider": "OpenRouter"
+            "result": content,
+            "model": model,
+            "provider": "OpenRouter",
+            "cached": cached
         })
 
     except Exception as e:
@@ -142,7 +195,7 @@ def generate_content():
         }), 500
 
 # Import and register all blueprints
-from routes.auth import bp as auth_bp,limiter
+from routes.auth import bp as auth_bp
 from routes.material import bp as material_bp
 from routes.recommend import bp as recommend_bp
 from routes.progress import bp as progress_bp
@@ -151,7 +204,6 @@ from routes.youtube import bp as youtube_bp
 from routes.streak import bp as streak_bp
 
 app.register_blueprint(auth_bp)
-limiter.init_app(app)
 app.register_blueprint(material_bp)
 app.register_blueprint(recommend_bp)
 app.register_blueprint(progress_bp)
@@ -159,6 +211,40 @@ app.register_blueprint(quiz_bp)
 app.register_blueprint(youtube_bp)
 app.register_blueprint(streak_bp)
 
+# Background maintenance
+from utils.scheduler import run_every, job_stats
+from utils.token_store import TOKEN_CLEANUP_INTERVAL
+from routes.auth import cleanup_expired_tokens
+run_every('refresh-token-cleanup', TOKEN_CLEANUP_INTERVAL, cleanup_expired_tokens, app=app)
+
+from utils.quiz_jobs import quiz_jobs, QUIZ_JOB_STALE_AFTER
+quiz_jobs.start(app)
+run_every('quiz-job-recovery', QUIZ_JOB_STALE_AFTER / 2, quiz_jobs.recover_stale_jobs, app=app)
+
+from utils.question_stock import question_stock, QUIZ_STOCK_FILL_INTERVAL
+run_every('quiz-stock-fill', QUIZ_STOCK_FILL_INTERVAL, question_stock.fill, app=app)
+run_every('llm-cache-cleanup', LLM_CACHE_CLEANUP_INTERVAL, llm_cache.cleanup, app=app)
+
+# Dependency probing for /health/ready
+from database.db import get_db_connection
+from routes.auth import get_connection as get_auth_connection
+from routes.streak import get_db_connection as get_streak_connection
+health_prober.register('mysql_edu_pool', mysql_check(get_db_connection), critical=True)
+health_prober.register('mysql_auth_pool', mysql_check(get_auth_connection), critical=True)
+health_prober.register('mysql_streak_pool', mysql_check(get_streak_connection), critical=True)
+# /key reports the API key's limits without spending any tokens
+openrouter_check = http_check(
+    f"{app.config['LLM_BASE_URL']}/key",
+    headers={"Authorization": f"Bearer {app.config['OPENROUTER_API_KEY']}"}
+)
+health_prober.register('openrouter', openrouter_check)
+# No key: the API answers 403 without charging quota, which still proves it is reachable
+health_prober.register('youtube', http_check(
+    "https://www.googleapis.com/youtube/v3/videos",
+    reachability_only=True
+))
+health_prober.start(app)
+
 
 # Inside your app.py
 #from flask import send_from_directory
@@ -178,9 +264,10 @@ def serve_avatar(filename):
 
 if __name__ == '__main__':
     # Verify API key on startup
-    if not verify_openrouter_key():
-        logger.error("❌ Invalid OpenRouter API key. Update .env file.")
-    else:
+    try:
+        openrouter_check()
         logger.info("✅ OpenRouter API key verified")
+    except Exception as e:
+        logger.error(f"❌ OpenRouter API key check failed ({e}). Update .env file.")
     
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
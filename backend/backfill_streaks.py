@@ -0,0 +1,111 @@
+"""Compute user_streaks for existing users from their study_sessions history.
+
+Users are processed in batches; within a batch all streak runs are found at
+once with NumPy instead of walking each user's dates in Python.
+
+    python backfill_streaks.py --batch-size 1000
+"""
+import argparse
+import numpy as np
+import mysql.connector
+from config import Config
+
+
+def compute_streaks(user_ids, day_numbers):
+    """Return (users, current_streak, longest_streak, last_day) arrays.
+
+    Inputs are parallel arrays of distinct (user, day) pairs sorted by user
+    then day. current_streak is the length of the run ending on the user's
+    last active day; /api/streak/<id> zeroes it once that day is too old.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    day_numbers = np.asarray(day_numbers, dtype=np.int64)
+    if user_ids.size == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty
+
+    new_user = np.empty(user_ids.size, dtype=bool)
+    new_user[0] = True
+    new_user[1:] = user_ids[1:] != user_ids[:-1]
+
+    new_run = new_user.copy()
+    new_run[1:] |= np.diff(day_numbers) != 1
+
+    run_starts = np.flatnonzero(new_run)
+    run_lengths = np.diff(np.append(run_starts, user_ids.size))
+
+    # Group runs by user: a user's runs start at the run beginning with that user
+    user_first_run = np.flatnonzero(new_user[run_starts])
+    longest = np.maximum.reduceat(run_lengths, user_first_run)
+    user_last_run = np.append(user_first_run[1:], run_starts.size) - 1
+    current = run_lengths[user_last_run]
+
+    user_last_row = np.append(np.flatnonzero(new_user)[1:], user_ids.size) - 1
+    return user_ids[new_user], current, longest, day_numbers[user_last_row]
+
+
+def backfill_streaks(batch_size=1000):
+    conn = mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME
+    )
+    cursor = conn.cursor()
+    last_user_id = 0
+    total = 0
+
+    try:
+        while True:
+            cursor.execute("""
+                SELECT DISTINCT user_id FROM study_sessions
+                WHERE user_id > %s
+                ORDER BY user_id
+                LIMIT %s
+            """, (last_user_id, batch_size))
+            batch = [row[0] for row in cursor.fetchall()]
+            if not batch:
+                break
+
+            cursor.execute("""
+                SELECT user_id, TO_DAYS(session_date) AS day
+                FROM study_sessions
+                WHERE user_id BETWEEN %s AND %s
+                GROUP BY user_id, TO_DAYS(session_date)
+                ORDER BY user_id, day
+            """, (batch[0], batch[-1]))
+            rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+
+            users, current, longest, last_day = compute_streaks(rows[:, 0], rows[:, 1])
+
+            # Never overwrite state a live update has already moved past
+            cursor.executemany("""
+                INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active)
+                VALUES (%s, %s, %s, FROM_DAYS(%s))
+                ON DUPLICATE KEY UPDATE
+                    current_streak = IF(last_active > VALUES(last_active),
+                                        current_streak, VALUES(current_streak)),
+                    longest_streak = GREATEST(longest_streak, VALUES(longest_streak)),
+                    last_active = GREATEST(COALESCE(last_active, VALUES(last_active)),
+                                           VALUES(last_active))
+            """, [
+                (int(u), int(c), int(l), int(d))
+                for u, c, l, d in zip(users, current, longest, last_day)
+            ])
+            conn.commit()
+
+            total += len(users)
+            last_user_id = batch[-1]
+            print(f"Backfilled streaks for {total} users (up to id {last_user_id})")
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"\nDone. {total} users backfilled.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill user_streaks from study_sessions")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    backfill_streaks(args.batch_size)
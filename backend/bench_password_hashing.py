@@ -0,0 +1,61 @@
+"""Measure login-style password verification throughput.
+
+Compares verifying on the calling thread (what a request thread did before)
+with the process pool used by routes/auth.py, and reports logins/s per core.
+
+    python bench_password_hashing.py --requests 200 --concurrency 32
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils.password_hashing import PasswordHasher, PasswordPoolSaturated, PASSWORD_HASH_METHOD
+
+
+def run(label, verify, hashed, requests, concurrency, cores):
+    rejected = 0
+
+    def one(_):
+        nonlocal rejected
+        try:
+            return verify(hashed, "correct horse battery staple")
+        except PasswordPoolSaturated:
+            rejected += 1
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        list(threads.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    served = requests - rejected
+    print(f"{label:<28} {served / elapsed:8.1f} logins/s  "
+          f"{served / elapsed / cores:8.1f} per core  "
+          f"({rejected} rejected with 503)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--method', default=PASSWORD_HASH_METHOD)
+    args = parser.parse_args()
+
+    hashed = generate_password_hash("correct horse battery staple", method=args.method)
+    print(f"method={args.method} requests={args.requests} concurrency={args.concurrency}\n")
+
+    run("request thread (GIL-bound)", check_password_hash, hashed,
+        args.requests, args.concurrency, 1)
+
+    hasher = PasswordHasher(method=args.method, workers=args.workers,
+                            queue_depth=args.requests)
+    hasher.verify(hashed, "warm up the pool")
+    run(f"process pool ({args.workers} workers)", hasher.verify, hashed,
+        args.requests, args.concurrency, args.workers)
+
+
+if __name__ == "__main__":
+    main()
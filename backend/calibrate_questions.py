@@ -0,0 +1,49 @@
+"""Estimate quiz question difficulty and discrimination from quiz_responses.
+
+Writes the estimates to quiz_questions (see utils/item_calibration.py) and
+bumps the quiz_questions version so answer keys pick up the new
+difficulties. Run periodically (e.g. nightly cron):
+
+    python calibrate_questions.py
+
+The bump only reaches the web workers through a shared CACHE_URL (redis://).
+With memory:// they reload answer keys after ANSWER_KEY_TTL seconds, but the
+/api/quiz/questions ETags stay unchanged until a worker sees another write
+or restarts.
+"""
+import mysql.connector
+from config import Config
+from utils import item_calibration
+from utils.cache import invalidate
+from utils.shared_store import is_shared
+
+
+def calibrate_questions():
+    conn = mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME
+    )
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        updated = item_calibration.calibrate(cursor)
+        conn.commit()
+        print(f"Calibrated {updated} questions.")
+    except mysql.connector.Error as err:
+        conn.rollback()
+        print(f"Calibration failed: {err}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not is_shared():
+        print("Warning: CACHE_URL is not shared, so web workers will not see this run until "
+              "their answer keys expire (ANSWER_KEY_TTL) or they restart.")
+    invalidate('quiz_questions')
+
+
+if __name__ == "__main__":
+    calibrate_questions()
@@ -8,6 +8,7 @@ CREATE TABLE users (
     email VARCHAR(100) NOT NULL UNIQUE,
     hashed_password VARCHAR(255) NOT NULL,
     role ENUM('admin', 'teacher', 'student') NOT NULL DEFAULT 'student',
+    avatar VARCHAR(255) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -30,7 +31,12 @@ CREATE TABLE IF NOT EXISTS quiz_questions (
     option_b TEXT NOT NULL,
     option_c TEXT NOT NULL,
     option_d TEXT NOT NULL,
-    correct_option ENUM('A', 'B', 'C', 'D') NOT NULL
+    correct_option ENUM('A', 'B', 'C', 'D') NOT NULL,
+    -- Item statistics written by calibrate_questions.py
+    difficulty FLOAT NULL,
+    discrimination FLOAT NULL,
+    calibration_responses INT NULL,
+    calibrated_at DATETIME NULL
 );
 
 -- Quiz Results Table
@@ -50,3 +56,139 @@ CREATE TABLE IF NOT EXISTS user_progress (
     attempt_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Progress aggregates (maintained by utils/progress_aggregates.py)
+CREATE TABLE IF NOT EXISTS subject_progress_stats (
+    subject_id INT PRIMARY KEY,
+    total_materials INT NOT NULL DEFAULT 0,
+    accessed_materials INT NOT NULL DEFAULT 0,
+    completed_materials INT NOT NULL DEFAULT 0,
+    active_students INT NOT NULL DEFAULT 0,
+    completions INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS student_progress_stats (
+    user_email VARCHAR(100) PRIMARY KEY,
+    materials_accessed INT NOT NULL DEFAULT 0,
+    to_learn INT NOT NULL DEFAULT 0,
+    in_progress INT NOT NULL DEFAULT 0,
+    completed INT NOT NULL DEFAULT 0,
+    last_activity TIMESTAMP NULL,
+    INDEX idx_student_progress_last_activity (last_activity)
+);
+
+CREATE TABLE IF NOT EXISTS student_subject_progress (
+    user_email VARCHAR(100) NOT NULL,
+    subject_id INT NOT NULL,
+    materials_accessed INT NOT NULL DEFAULT 0,
+    completed INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_email, subject_id)
+);
+
+-- Streak state, advanced in O(1) by /api/streak/update
+CREATE TABLE IF NOT EXISTS user_streaks (
+    user_id INT PRIMARY KEY,
+    current_streak INT NOT NULL DEFAULT 0,
+    longest_streak INT NOT NULL DEFAULT 0,
+    last_active DATE NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Refresh tokens (one per user) and revoked JTIs (see utils/token_store.py)
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL UNIQUE,
+    token_jti VARCHAR(64) NOT NULL UNIQUE,
+    expires_at DATETIME NOT NULL,
+    user_agent VARCHAR(200),
+    ip_address VARCHAR(45),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_refresh_tokens_expires_at (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS revoked_refresh_tokens (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    token_jti VARCHAR(64) NOT NULL UNIQUE,
+    expires_at DATETIME NOT NULL,
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_revoked_refresh_tokens_expires_at (expires_at)
+);
+
+-- Question bank listing by topic (see get_all_questions in routes/quiz.py)
+CREATE INDEX idx_quiz_questions_topic_id ON quiz_questions (topic, id);
+
+-- Student roster paging and search (see get_students in routes/auth.py)
+CREATE INDEX idx_users_role_name ON users (role, name, id);
+CREATE INDEX idx_users_role_created ON users (role, created_at, id);
+CREATE FULLTEXT INDEX ft_users_name_email ON users (name, email) WITH PARSER ngram;
+
+-- Background quiz generation jobs (see utils/quiz_jobs.py)
+CREATE TABLE IF NOT EXISTS quiz_generation_jobs (
+    id CHAR(32) PRIMARY KEY,
+    owner VARCHAR(64) NOT NULL,
+    topic VARCHAR(100) NOT NULL,
+    requested_count INT NOT NULL DEFAULT 1,
+    temperature FLOAT NOT NULL DEFAULT 0.7,
+    status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    locked_by VARCHAR(100),
+    result MEDIUMTEXT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    heartbeat_at DATETIME,
+    finished_at DATETIME,
+    INDEX idx_quiz_jobs_status_created (status, created_at),
+    INDEX idx_quiz_jobs_owner_status (owner, status)
+);
+
+-- Pre-generated questions not yet served (see utils/question_stock.py)
+CREATE TABLE IF NOT EXISTS quiz_question_stock (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    topic VARCHAR(100) NOT NULL,
+    question TEXT NOT NULL,
+    option_a TEXT NOT NULL,
+    option_b TEXT NOT NULL,
+    option_c TEXT NOT NULL,
+    option_d TEXT NOT NULL,
+    correct_option ENUM('A', 'B', 'C', 'D') NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_quiz_stock_topic (topic, id)
+);
+
+-- Requests per topic and day, ranks topics for the stock (see utils/question_stock.py)
+CREATE TABLE IF NOT EXISTS quiz_topic_demand (
+    topic VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    requests INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic, day),
+    INDEX idx_quiz_topic_demand_day (day)
+);
+
+-- Cached chat completions (see utils/llm_cache.py)
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    model VARCHAR(200) NOT NULL,
+    response MEDIUMTEXT NOT NULL,
+    hits INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_llm_response_cache_expires_at (expires_at)
+);
+
+-- Attempts per topic and score, for percentile ranking (see utils/score_histogram.py)
+CREATE TABLE IF NOT EXISTS quiz_score_histogram (
+    topic VARCHAR(100) NOT NULL,
+    score TINYINT UNSIGNED NOT NULL,
+    attempts INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic, score)
+);
+
+-- One row per answered question (see utils/quiz_responses.py)
+CREATE TABLE IF NOT EXISTS quiz_responses (
+    result_id INT NOT NULL,
+    question_id INT NOT NULL,
+    selected ENUM('A', 'B', 'C', 'D') NULL,
+    is_correct TINYINT(1) NOT NULL,
+    PRIMARY KEY (result_id, question_id)
+);
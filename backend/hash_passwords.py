@@ -1,43 +1,142 @@
+"""Hash plaintext passwords and report hashes that need a cost upgrade.
+
+Users are streamed in id order (keyset pagination), hashed in a process pool
+and written back with one UPDATE per chunk. Progress is checkpointed after
+every committed chunk, so an interrupted run resumes where it stopped:
+
+    python hash_passwords.py --chunk-size 500 --workers 8
+    python hash_passwords.py --reset      # start again from the first user
+
+Existing scrypt/pbkdf2 hashes cannot be re-derived without the password.
+Those made with an older method or cost are counted here and upgraded by
+/api/auth/login the next time their owner signs in.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import mysql.connector
-from werkzeug.security import generate_password_hash
+from config import Config
+from utils.password_hashing import PasswordHasher, PASSWORD_HASH_METHOD, is_hashed, _hash
+
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.hash_passwords.checkpoint')
+
 
 # ✅ Utility to detect already hashed passwords
 def is_already_hashed(pwd: str) -> bool:
-    return pwd.startswith("scrypt:") or pwd.startswith("pbkdf2:")
-
-# ✅ MySQL connection setup
-conn = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="ganesh",  # 🔐 Change this to your DB password
-    database="study_recommender"
-)
-cursor = conn.cursor(dictionary=True)
-
-# ✅ Fetch all users and their passwords
-cursor.execute("SELECT id, email, hashed_password FROM users")
-users = cursor.fetchall()
-
-# ✅ Loop through users and hash only plaintext passwords
-for user in users:
-    current_pwd = user['hashed_password']
-    email = user['email']
-    user_id = user['id']
-
-    if is_already_hashed(current_pwd):
-        print(f"⚠️ Skipping already hashed password for {email}")
-        continue
-
-    new_hashed = generate_password_hash(current_pwd)
-    cursor.execute(
-        "UPDATE users SET hashed_password = %s WHERE id = %s",
-        (new_hashed, user_id)
+    return is_hashed(pwd)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {'last_id': 0, 'hashed': 0, 'pending_upgrade': 0, 'up_to_date': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def write_hashes(cursor, rows):
+    """Apply (id, old_value, new_hash) triples in one statement.
+
+    Rows whose password changed since they were read are left alone.
+    """
+    derived = " UNION ALL ".join(["SELECT %s AS id, %s AS old_value, %s AS new_value"] * len(rows))
+    params = [value for row in rows for value in row]
+    cursor.execute(f"""
+        UPDATE users u
+        JOIN ({derived}) AS x ON u.id = x.id AND u.hashed_password = x.old_value
+        SET u.hashed_password = x.new_value
+    """, params)
+    return cursor.rowcount
+
+
+def hash_passwords(chunk_size=500, workers=None, method=PASSWORD_HASH_METHOD,
+                   checkpoint=CHECKPOINT_FILE):
+    state = load_checkpoint(checkpoint)
+    if state['last_id']:
+        print(f"↩️  Resuming after user id {state['last_id']}")
+
+    upgrade_check = PasswordHasher(method=method, workers=0)
+    workers = workers or os.cpu_count() or 2
+
+    # ✅ MySQL connection setup
+    conn = mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME
     )
-    print(f"✅ Hashed password updated for {email}")
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                cursor.execute("""
+                    SELECT id, email, hashed_password FROM users
+                    WHERE id > %s
+                    ORDER BY id
+                    LIMIT %s
+                """, (state['last_id'], chunk_size))
+                users = cursor.fetchall()
+                if not users:
+                    break
+
+                plaintext = []
+                for user in users:
+                    current_pwd = user['hashed_password']
+                    if not is_already_hashed(current_pwd):
+                        plaintext.append(user)
+                    elif upgrade_check.needs_rehash(current_pwd):
+                        state['pending_upgrade'] += 1
+                    else:
+                        state['up_to_date'] += 1
+
+                if plaintext:
+                    hashes = pool.map(
+                        _hash,
+                        [user['hashed_password'] for user in plaintext],
+                        [method] * len(plaintext),
+                        chunksize=max(1, len(plaintext) // (workers * 4))
+                    )
+                    rows = [
+                        (user['id'], user['hashed_password'], new_hash)
+                        for user, new_hash in zip(plaintext, hashes)
+                    ]
+                    state['hashed'] += write_hashes(cursor, rows)
+
+                conn.commit()
+                state['last_id'] = users[-1]['id']
+                save_checkpoint(checkpoint, state)
+                print(f"✅ Processed users up to id {state['last_id']} "
+                      f"({state['hashed']} hashed so far)")
+    finally:
+        # ✅ Close DB connection
+        cursor.close()
+        conn.close()
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    print(f"\n🎉 Done. {state['hashed']} plaintext passwords hashed, "
+          f"{state['up_to_date']} already current, "
+          f"{state['pending_upgrade']} will be upgraded at next login.")
+
 
-# ✅ Commit and close DB connection
-conn.commit()
-cursor.close()
-conn.close()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hash plaintext passwords in bulk")
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--method', default=PASSWORD_HASH_METHOD)
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE)
+    parser.add_argument('--reset', action='store_true', help="ignore any saved checkpoint")
+    args = parser.parse_args()
 
-print("\n🎉 All passwords hashed successfully (without duplicates).")
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    hash_passwords(args.chunk_size, args.workers, args.method, args.checkpoint)
@@ -1,4 +1,28 @@
 import mysql.connector
+from utils import progress_aggregates, score_histogram
+
+def ensure_index(cursor, table, index_name, definition):
+    """Create an index unless it already exists (MySQL lacks IF NOT EXISTS here)"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index_name))
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+
+def column_exists(cursor, table, column_name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    """, (table, column_name))
+    return cursor.fetchone() is not None
+
+def ensure_column(cursor, table, column_name, definition):
+    """Add a column unless it already exists"""
+    if not column_exists(cursor, table, column_name):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {definition}")
 
 def init_db():
     conn = mysql.connector.connect(
@@ -46,7 +70,11 @@ def init_db():
         option_b TEXT,
         option_c TEXT,
         option_d TEXT,
-        correct_option ENUM('A', 'B', 'C', 'D') NOT NULL
+        correct_option ENUM('A', 'B', 'C', 'D') NOT NULL,
+        difficulty FLOAT NULL,
+        discrimination FLOAT NULL,
+        calibration_responses INT NULL,
+        calibrated_at DATETIME NULL
     )
     """)
 
@@ -72,6 +100,210 @@ def init_db():
     )
     """)
 
+    # Progress aggregates (maintained by utils/progress_aggregates.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS subject_progress_stats (
+        subject_id INT PRIMARY KEY,
+        total_materials INT NOT NULL DEFAULT 0,
+        accessed_materials INT NOT NULL DEFAULT 0,
+        completed_materials INT NOT NULL DEFAULT 0,
+        active_students INT NOT NULL DEFAULT 0,
+        completions INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS student_progress_stats (
+        user_email VARCHAR(100) PRIMARY KEY,
+        materials_accessed INT NOT NULL DEFAULT 0,
+        to_learn INT NOT NULL DEFAULT 0,
+        in_progress INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        last_activity TIMESTAMP NULL,
+        INDEX idx_student_progress_last_activity (last_activity)
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS student_subject_progress (
+        user_email VARCHAR(100) NOT NULL,
+        subject_id INT NOT NULL,
+        materials_accessed INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_email, subject_id)
+    )
+    """)
+
+    # Incremental streak state (see routes/streak.py and backfill_streaks.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_streaks (
+        user_id INT PRIMARY KEY,
+        current_streak INT NOT NULL DEFAULT 0,
+        longest_streak INT NOT NULL DEFAULT 0,
+        last_active DATE NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Refresh tokens and their revocations (see utils/token_store.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS refresh_tokens (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL UNIQUE,
+        token_jti VARCHAR(64) NOT NULL UNIQUE,
+        expires_at DATETIME NOT NULL,
+        user_agent VARCHAR(200),
+        ip_address VARCHAR(45),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_refresh_tokens_expires_at (expires_at)
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS revoked_refresh_tokens (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        token_jti VARCHAR(64) NOT NULL UNIQUE,
+        expires_at DATETIME NOT NULL,
+        revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_revoked_refresh_tokens_expires_at (expires_at)
+    )
+    """)
+
+    # Background quiz generation (see utils/quiz_jobs.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_generation_jobs (
+        id CHAR(32) PRIMARY KEY,
+        owner VARCHAR(64) NOT NULL,
+        topic VARCHAR(100) NOT NULL,
+        requested_count INT NOT NULL DEFAULT 1,
+        temperature FLOAT NOT NULL DEFAULT 0.7,
+        status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+        attempts INT NOT NULL DEFAULT 0,
+        locked_by VARCHAR(100),
+        result MEDIUMTEXT,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at DATETIME,
+        heartbeat_at DATETIME,
+        finished_at DATETIME,
+        INDEX idx_quiz_jobs_status_created (status, created_at),
+        INDEX idx_quiz_jobs_owner_status (owner, status)
+    )
+    """)
+
+    # Pre-generated questions not yet served (see utils/question_stock.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_question_stock (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        topic VARCHAR(100) NOT NULL,
+        question TEXT NOT NULL,
+        option_a TEXT NOT NULL,
+        option_b TEXT NOT NULL,
+        option_c TEXT NOT NULL,
+        option_d TEXT NOT NULL,
+        correct_option ENUM('A', 'B', 'C', 'D') NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_quiz_stock_topic (topic, id)
+    )
+    """)
+
+    # Requests per topic and day, ranks topics for the stock (see utils/question_stock.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_topic_demand (
+        topic VARCHAR(100) NOT NULL,
+        day DATE NOT NULL,
+        requests INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (topic, day),
+        INDEX idx_quiz_topic_demand_day (day)
+    )
+    """)
+
+    # Cached chat completions (see utils/llm_cache.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS llm_response_cache (
+        cache_key CHAR(64) PRIMARY KEY,
+        model VARCHAR(200) NOT NULL,
+        response MEDIUMTEXT NOT NULL,
+        hits INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at DATETIME NOT NULL,
+        INDEX idx_llm_response_cache_expires_at (expires_at)
+    )
+    """)
+
+    # Attempts per topic and score, for percentile ranking (see utils/score_histogram.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_score_histogram (
+        topic VARCHAR(100) NOT NULL,
+        score TINYINT UNSIGNED NOT NULL,
+        attempts INT UNSIGNED NOT NULL DEFAULT 0,
+        PRIMARY KEY (topic, score)
+    )
+    """)
+
+    # One row per answered question (see utils/quiz_responses.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_responses (
+        result_id INT NOT NULL,
+        question_id INT NOT NULL,
+        selected ENUM('A', 'B', 'C', 'D') NULL,
+        is_correct TINYINT(1) NOT NULL,
+        PRIMARY KEY (result_id, question_id)
+    )
+    """)
+
+    # Profile picture path written by /upload_avatar
+    ensure_column(cursor, 'users', 'avatar', 'VARCHAR(255) NULL')
+
+    # Item statistics written by calibrate_questions.py
+    ensure_column(cursor, 'quiz_questions', 'difficulty', 'FLOAT NULL')
+    ensure_column(cursor, 'quiz_questions', 'discrimination', 'FLOAT NULL')
+    ensure_column(cursor, 'quiz_questions', 'calibration_responses', 'INT NULL')
+    ensure_column(cursor, 'quiz_questions', 'calibrated_at', 'DATETIME NULL')
+
+    ensure_index(cursor, 'refresh_tokens', 'idx_refresh_tokens_expires_at',
+                 'INDEX idx_refresh_tokens_expires_at (expires_at)')
+
+    ensure_index(cursor, 'user_progress', 'idx_user_progress_material_status',
+                 'INDEX idx_user_progress_material_status (material_id, status)')
+    ensure_index(cursor, 'user_progress', 'idx_user_progress_email_material',
+                 'INDEX idx_user_progress_email_material (user_email, material_id)')
+
+    # Question bank listing and answer keys: topic filter in id order
+    ensure_index(cursor, 'quiz_questions', 'idx_quiz_questions_topic_id',
+                 'INDEX idx_quiz_questions_topic_id (topic, id)')
+
+    # Student roster: keyset pagination per sort order and n-gram search
+    ensure_index(cursor, 'users', 'idx_users_role_name',
+                 'INDEX idx_users_role_name (role, name, id)')
+    ensure_index(cursor, 'users', 'idx_users_role_created',
+                 'INDEX idx_users_role_created (role, created_at, id)')
+    ensure_index(cursor, 'users', 'ft_users_name_email',
+                 'FULLTEXT INDEX ft_users_name_email (name, email) WITH PARSER ngram')
+
+    # First deploy of the progress aggregates: fill them from the base tables.
+    # subjects and study_materials.subject_id come from the full schema
+    # (database/schema.sql setups), not from this script.
+    cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM subject_progress_stats)
+            + (SELECT COUNT(*) FROM student_progress_stats)
+    """)
+    if cursor.fetchone()[0] == 0:
+        if column_exists(cursor, 'subjects', 'id') and column_exists(cursor, 'study_materials', 'subject_id'):
+            subjects, students = progress_aggregates.reconcile(cursor)
+            print(f"[✓] Backfilled progress aggregates ({subjects} subjects, {students} students).")
+        else:
+            print("[!] Skipped progress aggregate backfill: subjects or study_materials.subject_id "
+                  "is missing. Run reconcile_progress_stats.py once they exist.")
+
+    # First deploy of the score histograms: count the attempts already stored
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM quiz_score_histogram)")
+    if not cursor.fetchone()[0]:
+        topics = score_histogram.reconcile(cursor)
+        print(f"[✓] Backfilled score histograms ({topics} topics).")
+
     print("[✓] Tables are initialized.")
     conn.commit()
     conn.close()
@@ -0,0 +1,165 @@
+"""Local OpenAI-compatible stand-in for OpenRouter.
+
+Answers POST /v1/chat/completions with deterministic fake content: quiz
+prompts ("Generate N different <topic> ...") get N well-formed questions,
+anything else gets a short echo. "stream": true is answered with
+chat.completion.chunk events, one word every --token-delay seconds.
+Useful for exercising quiz generation and /api/generate without network
+access or API credits:
+
+    python llm_stub_server.py --port 8001 --latency 0.5
+    LLM_BASE_URL=http://localhost:8001/v1 python app.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUIZ_PROMPT = re.compile(r"Generate (?:(\d+) different|an?) (.+?) multiple-choice", re.S)
+
+
+def fake_questions(topic, count, seed):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        n = rng.randint(1, 10 ** 6)
+        answer = rng.choice('ABCD')
+        options = {key: f"{topic} option {key}{n}" for key in 'ABCD'}
+        questions.append({
+            "question": f"Stub {topic} question #{n}?",
+            "options": options,
+            "answer": answer
+        })
+    return questions
+
+
+def completion_content(messages, json_mode):
+    prompt = messages[-1].get('content', '') if messages else ''
+    match = QUIZ_PROMPT.search(prompt)
+    if match:
+        count = int(match.group(1) or 1)
+        seed = hashlib.sha1(f"{prompt}{time.time_ns()}".encode()).hexdigest()
+        questions = fake_questions(match.group(2).strip(), count, seed)
+        return json.dumps({"questions": questions} if match.group(1) else questions[0])
+    if json_mode:
+        return json.dumps({"reply": prompt[:200]})
+    return f"Stub reply to: {prompt[:200]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model, content):
+        """Send content as chat.completion.chunk events, one word at a time"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = re.findall(r'\S+\s*', content) or ['']
+        try:
+            for index, word in enumerate(words):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": word} if index == 0 else {"content": word},
+                        "finish_reason": "stop" if index == len(words) - 1 else None
+                    }]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(self.server.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The caller hung up mid-stream, which is what cancellation looks like here
+            self.server.cancelled_streams += 1
+            if self.server.verbose:
+                print(f"Stream {completion_id} cancelled after {index} chunks")
+
+    def do_GET(self):
+        # OpenRouter's key endpoint, used by the /health/ready prober
+        if self.path.rstrip('/') == '/v1/key':
+            return self._send_json(200, {"data": {"label": "stub", "usage": 0, "limit": None}})
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON"}})
+
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        time.sleep(self.server.latency)
+        json_mode = (request.get('response_format') or {}).get('type') == 'json_object'
+        content = completion_content(request.get('messages', []), json_mode)
+        if request.get('stream'):
+            return self._send_stream(request.get('model', 'stub'), content)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": sum(len(m.get('content', '').split()) for m in request.get('messages', [])),
+                "completion_tokens": len(content.split()),
+                "total_tokens": 0
+            }
+        })
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub for local testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to wait per completion")
+    parser.add_argument('--token-delay', type=float, default=0.05,
+                        help="seconds between streamed chunks")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.latency = args.latency
+    server.token_delay = args.token_delay
+    server.cancelled_streams = 0
+    server.verbose = args.verbose
+    print(f"LLM stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,8 +17,32 @@ class Quiz:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO quiz_questions (id,topic, question, option_a, option_b, option_c, option_d, correct_option) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """, (id,topic, question, option_a, option_b, option_c, option_d, correct_option))
         conn.commit()
         cursor.close()
         conn.close()
+
+    @staticmethod
+    def add_questions(questions, batch_size=500):
+        """Insert (topic, question, option_a..d, correct_option) tuples in one transaction"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            for start in range(0, len(questions), batch_size):
+                batch = questions[start:start + batch_size]
+                placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+                cursor.execute(f"""
+                    INSERT INTO quiz_questions
+                    (topic, question, option_a, option_b, option_c, option_d, correct_option)
+                    VALUES {placeholders}
+                """, [value for question in batch for value in question])
+            conn.commit()
+            return len(questions)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
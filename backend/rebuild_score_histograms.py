@@ -0,0 +1,36 @@
+"""Rebuild quiz_score_histogram from quiz_results.
+
+init_db backfills the table on first deploy; run this periodically
+(e.g. nightly cron) to repair any drift:
+
+    python rebuild_score_histograms.py
+"""
+import mysql.connector
+from config import Config
+from utils import score_histogram
+
+
+def rebuild_score_histograms():
+    conn = mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME
+    )
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        topics = score_histogram.reconcile(cursor)
+        conn.commit()
+        print(f"Rebuilt score histograms for {topics} topics.")
+    except mysql.connector.Error as err:
+        conn.rollback()
+        print(f"Rebuild failed: {err}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    rebuild_score_histograms()
@@ -0,0 +1,36 @@
+"""Rebuild the progress aggregate tables from user_progress.
+
+init_db.py fills the tables on first deploy. Run this periodically
+(e.g. nightly cron) to repair any drift:
+
+    python reconcile_progress_stats.py
+"""
+import mysql.connector
+from config import Config
+from utils import progress_aggregates
+
+
+def reconcile_progress_stats():
+    conn = mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME
+    )
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        subjects, students = progress_aggregates.reconcile(cursor)
+        conn.commit()
+        print(f"Reconciled {subjects} subjects and {students} students.")
+    except mysql.connector.Error as err:
+        conn.rollback()
+        print(f"Reconciliation failed: {err}")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    reconcile_progress_stats()
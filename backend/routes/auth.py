@@ -2,21 +2,21 @@ from flask import Blueprint, request, jsonify, current_app
 import mysql.connector
 import jwt
 import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+import os
 import uuid
+import json
+import base64
+import binascii
 from functools import wraps
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from utils import progress_aggregates
+from utils.user_directory import user_directory
+from utils.tokens_utils import token_verifier
+from utils.password_hashing import password_hasher, PasswordPoolSaturated, is_hashed
+from utils.token_store import token_store, REVOCATION_TRACKED_CLAIM
+from utils.rate_limit import limiter
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
-# Initialize rate limiter
-limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
-)
-
 # Token expiration times (in seconds)
 ACCESS_TOKEN_EXPIRATION = 3600  # 1 hour
 REFRESH_TOKEN_EXPIRATION = 2592000  # 30 days
@@ -52,6 +52,7 @@ def create_tokens(user_id, email, role, name):
         'iat': datetime.datetime.utcnow(),
         'type': 'refresh',
         'jti': str(uuid.uuid4()),
+        REVOCATION_TRACKED_CLAIM: 1,
         'user_agent': request.headers.get('User-Agent', '')[:200],
         'ip': request.remote_addr
     }
@@ -81,21 +82,19 @@ def validate_input(data, required_fields):
     
     return True, ""
 
+def hashing_unavailable(error):
+    """503 response used when the password hashing pool is saturated"""
+    response = jsonify({"error": "Server busy, please retry shortly"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 def cleanup_expired_tokens():
-    """Periodic cleanup of expired refresh tokens"""
+    """Periodic cleanup of expired refresh tokens, in small batches"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM refresh_tokens WHERE expires_at < UTC_TIMESTAMP()")
-        conn.commit()
-        current_app.logger.info("Cleaned up expired refresh tokens")
+        token_store.cleanup(get_connection)
     except Exception as e:
         current_app.logger.error(f"Token cleanup error: {str(e)}")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 @bp.route('/register', methods=['POST'])
 def register():
@@ -115,7 +114,10 @@ def register():
     if len(password) < 8:
         return jsonify({"error": "Password must be at least 8 characters"}), 400
 
-    hashed_password = generate_password_hash(password)
+    try:
+        hashed_password = password_hasher.hash(password)
+    except PasswordPoolSaturated as e:
+        return hashing_unavailable(e)
 
     try:
         conn = get_connection()
@@ -130,6 +132,9 @@ def register():
             VALUES (%s, %s, %s, %s)
         """, (name, email, hashed_password, role))
         user_id = cursor.lastrowid
+
+        if role == 'student':
+            progress_aggregates.register_student(cursor, email)
         
         # Create tokens for immediate login after registration
         access_token, refresh_token, _, refresh_jti = create_tokens(user_id, email, role, name)
@@ -175,7 +180,7 @@ def register():
 
 #checking if already hashed
 def is_already_hashed(pwd: str) -> bool:
-    return pwd.startswith("scrypt:") or pwd.startswith("pbkdf2:")
+    return is_hashed(pwd)
 #confirmation code
 
 @bp.route('/login', methods=['POST'])
@@ -201,20 +206,37 @@ def login():
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM users WHERE email=%s", (email,))
-        user = cursor.fetchone()
+        user = user_directory.get_by_email(cursor, email)
 
-        if not user or not check_password_hash(user['hashed_password'], password):
+        if not user or not password_hasher.verify(user.hashed_password, password):
             return jsonify({"error": "Invalid credentials"}), 401
 
+        # Upgrade hashes made with an older method or cost while we have the password
+        if password_hasher.needs_rehash(user.hashed_password):
+            cursor.execute(
+                "UPDATE users SET hashed_password = %s WHERE id = %s AND hashed_password = %s",
+                (password_hasher.hash(password), user.id, user.hashed_password)
+            )
+            user_directory.invalidate(user.id)
+
         # Create tokens
         access_token, refresh_token, _, refresh_jti = create_tokens(
-            user['id'], 
-            user['email'], 
-            user['role'], 
-            user['name']
+            user.id, 
+            user.email, 
+            user.role, 
+            user.name
         )
         
+        # The new refresh token replaces the user's previous one
+        cursor.execute(
+            "SELECT token_jti, expires_at FROM refresh_tokens WHERE user_id = %s",
+            (user.id,)
+        )
+        previous = cursor.fetchone()
+        replaced = previous is not None and previous['token_jti'] != refresh_jti
+        if replaced:
+            token_store.revoke(cursor, previous['token_jti'], previous['expires_at'])
+
         # Store refresh token
         cursor.execute("""
             INSERT INTO refresh_tokens (user_id, token_jti, expires_at, user_agent, ip_address)
@@ -225,7 +247,7 @@ def login():
                 user_agent = VALUES(user_agent),
                 ip_address = VALUES(ip_address)
         """, (
-            user['id'],
+            user.id,
             refresh_jti,
             datetime.datetime.utcnow() + datetime.timedelta(seconds=REFRESH_TOKEN_EXPIRATION),
             request.headers.get('User-Agent', '')[:200],
@@ -233,17 +255,14 @@ def login():
         ))
         
         conn.commit()
+        if replaced:
+            token_store.publish()
 
         # Build user response with avatar if exists
-        user_response = {
-            "id": user['id'],
-            "name": user['name'],
-            "email": user['email'],
-            "role": user['role']
-        }
+        user_response = user.to_dict()
         
-        if user.get('avatar'):
-            user_response['avatar'] = f"{request.host_url.rstrip('/')}{user['avatar'].lstrip('/')}"
+        if user.avatar:
+            user_response['avatar'] = f"{request.host_url.rstrip('/')}{user.avatar.lstrip('/')}"
 
         return jsonify({
             "accessToken": access_token,
@@ -251,6 +270,8 @@ def login():
             "user": user_response
         })
 
+    except PasswordPoolSaturated as e:
+        return hashing_unavailable(e)
     except Exception as e:
         current_app.logger.error(f"Login error: {str(e)}", exc_info=True)
         return jsonify({"error": "Internal server error"}), 500
@@ -285,20 +306,21 @@ def refresh():
         if payload.get('type') != 'refresh':
             return jsonify({"error": "Invalid token type"}), 401
 
-        # Verify the token matches the stored one
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT * FROM refresh_tokens 
-            WHERE token_jti = %s AND user_id = %s AND expires_at > UTC_TIMESTAMP()
-            FOR UPDATE
-        """, (payload['jti'], payload['user_id']))
-        
-        token_record = cursor.fetchone()
-        
-        if not token_record:
-            return jsonify({"error": "Invalid or expired refresh token"}), 401
+
+        # The stored row decides, unless the revocation filter can vouch for
+        # the token (see utils/token_store.py)
+        if not token_store.can_skip_lookup(cursor, payload):
+            cursor.execute("""
+                SELECT id FROM refresh_tokens 
+                WHERE token_jti = %s AND user_id = %s AND expires_at > UTC_TIMESTAMP()
+            """, (payload['jti'], payload['user_id']))
+            
+            token_record = cursor.fetchone()
+            
+            if not token_record:
+                return jsonify({"error": "Invalid or expired refresh token"}), 401
         
         # Verify the requesting IP matches the token's original IP
         if payload.get('ip') != request.remote_addr:
@@ -307,27 +329,21 @@ def refresh():
             )
             return jsonify({"error": "Invalid refresh token"}), 401
         
-        cursor.execute("SELECT * FROM users WHERE id = %s", (payload['user_id'],))
-        user = cursor.fetchone()
+        user = user_directory.get_by_id(cursor, payload['user_id'])
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
         new_access_token, _, access_jti, _ = create_tokens(
-            user['id'],
-            user['email'],
-            user['role'],
-            user['name']
+            user.id,
+            user.email,
+            user.role,
+            user.name
         )
         
         return jsonify({
             "accessToken": new_access_token,
-            "user": {
-                "id": user['id'],
-                "name": user['name'],
-                "email": user['email'],
-                "role": user['role']
-            }
+            "user": user.to_dict()
         })
 
     except Exception as e:
@@ -364,7 +380,13 @@ def logout():
                         DELETE FROM refresh_tokens 
                         WHERE token_jti = %s AND user_id = %s
                     """, (payload['jti'], payload['user_id']))
+                    token_store.revoke(
+                        cursor,
+                        payload['jti'],
+                        datetime.datetime.utcfromtimestamp(payload['exp'])
+                    )
                     conn.commit()
+                    token_store.publish()
             except jwt.InvalidTokenError:
                 pass
         
@@ -381,6 +403,54 @@ def logout():
 
 # ... [rest of your existing routes remain unchanged]
 
+# Sort key -> (column, direction); every order is completed by id
+STUDENT_SORTS = {
+    'name': ('name', 'ASC'),
+    'newest': ('created_at', 'DESC'),
+    'oldest': ('created_at', 'ASC'),
+    'id': ('id', 'ASC')
+}
+
+# InnoDB's ngram parser indexes tokens of this many characters
+NGRAM_TOKEN_SIZE = 2
+
+def student_filters(search, exclude_test):
+    """SQL fragment and params shared by the list and count queries"""
+    sql = ""
+    params = []
+
+    if search:
+        term = search.replace('"', ' ').strip()
+        if len(term) >= NGRAM_TOKEN_SIZE:
+            # Phrase search on the ngram full-text index matches substrings
+            sql += " AND MATCH(name, email) AGAINST (%s IN BOOLEAN MODE)"
+            params.append(f'"{term}"')
+        elif term:
+            # Too short for the ngram index: keep the substring match with a
+            # scan, which a single character makes unselective anyway
+            sql += " AND (name LIKE %s OR email LIKE %s)"
+            params.extend([f"%{term}%", f"%{term}%"])
+
+    if exclude_test:
+        sql += " AND name NOT LIKE %s AND email NOT LIKE %s"
+        params.extend(["%Test%", "%test%"])
+
+    return sql, params
+
+def encode_page_cursor(sort, last_value, last_id):
+    if isinstance(last_value, datetime.datetime):
+        last_value = last_value.isoformat(sep=' ')
+    raw = json.dumps([sort, last_value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_page_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        sort, last_value, last_id = json.loads(raw)
+        return sort, last_value, int(last_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
 @bp.route('/students', methods=['GET'])
 def get_students():
     try:
@@ -391,11 +461,7 @@ def get_students():
 
         token = auth_header.split(' ')[1]
         try:
-            payload = jwt.decode(
-                token,
-                current_app.config['SECRET_KEY'],
-                algorithms=["HS256"]
-            )
+            payload = token_verifier.verify(token)
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Access token expired"}), 401
         except jwt.InvalidTokenError:
@@ -406,71 +472,99 @@ def get_students():
 
         # --- Query Parameters ---
         page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
+        per_page = max(1, min(request.args.get('per_page', default=10, type=int), 100))
         search = request.args.get('search', default=None, type=str)
         exclude_test = request.args.get('exclude_test', default=False, type=lambda v: v.lower() == 'true')
         sort = request.args.get('sort', default='id')
-
-        offset = (page - 1) * per_page
+        if sort not in STUDENT_SORTS:
+            sort = 'id'
+        # Passing ?cursor= (empty for the first page) switches to keyset paging
+        page_cursor = request.args.get('cursor', default=None, type=str)
+        count_mode = request.args.get('count', default='exact' if page_cursor is None else 'none')
 
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
+        filter_sql, filter_params = student_filters(search, exclude_test)
+        column, direction = STUDENT_SORTS[sort]
+        comparison = '>' if direction == 'ASC' else '<'
+
         # --- Build Main Query ---
-        query = """
+        query = f"""
             SELECT id, name, email, created_at 
             FROM users 
-            WHERE role = 'student'
+            WHERE role = 'student'{filter_sql}
         """
-        query_params = []
-
-        if search:
-            query += " AND (name LIKE %s OR email LIKE %s)"
-            query_params.extend([f"%{search}%", f"%{search}%"])
-
-        if exclude_test:
-            query += " AND name NOT LIKE %s AND email NOT LIKE %s"
-            query_params.extend(["%Test%", "%test%"])
+        query_params = list(filter_params)
 
-        # Sorting
-        sort_options = {
-            'name': 'name ASC',
-            'newest': 'created_at DESC',
-            'oldest': 'created_at ASC',
-            'id': 'id ASC'
-        }
-        query += f" ORDER BY {sort_options.get(sort, 'id ASC')}"
+        if page_cursor:
+            try:
+                cursor_sort, last_value, last_id = decode_page_cursor(page_cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            if cursor_sort != sort:
+                return jsonify({"error": "Cursor does not match sort order"}), 400
+            if column == 'id':
+                query += f" AND id {comparison} %s"
+                query_params.append(last_id)
+            else:
+                query += f" AND ({column} {comparison} %s OR ({column} = %s AND id {comparison} %s))"
+                query_params.extend([last_value, last_value, last_id])
+
+        # Sorting (id breaks ties so keyset positions are unique)
+        if column == 'id':
+            query += f" ORDER BY id {direction}"
+        else:
+            query += f" ORDER BY {column} {direction}, id {direction}"
 
         # Pagination
-        query += " LIMIT %s OFFSET %s"
-        query_params.extend([per_page, offset])
+        if page_cursor is None:
+            query += " LIMIT %s OFFSET %s"
+            query_params.extend([per_page, (page - 1) * per_page])
+        else:
+            query += " LIMIT %s"
+            query_params.append(per_page + 1)
 
         cursor.execute(query, query_params)
         students = cursor.fetchall()
 
-        # --- Count Query ---
-        count_query = "SELECT COUNT(*) as total FROM users WHERE role = 'student'"
-        count_params = []
-
-        if search:
-            count_query += " AND (name LIKE %s OR email LIKE %s)"
-            count_params.extend([f"%{search}%", f"%{search}%"])
+        pagination = {"per_page": per_page}
+        if page_cursor is None:
+            pagination["page"] = page
+        else:
+            has_more = len(students) > per_page
+            students = students[:per_page]
+            last = students[-1] if students else None
+            pagination["has_more"] = has_more
+            pagination["next_cursor"] = (
+                encode_page_cursor(sort, last[column], last['id']) if has_more else None
+            )
 
-        if exclude_test:
-            count_query += " AND name NOT LIKE %s AND email NOT LIKE %s"
-            count_params.extend(["%Test%", "%test%"])
+        # --- Count Query ---
+        total = None
+        if count_mode == 'exact':
+            cursor.execute(
+                f"SELECT COUNT(*) as total FROM users WHERE role = 'student'{filter_sql}",
+                filter_params
+            )
+            total = cursor.fetchone()['total']
+        elif count_mode == 'approx':
+            # Optimizer row estimate: no scan, but only roughly right
+            cursor.execute(
+                f"EXPLAIN SELECT id FROM users WHERE role = 'student'{filter_sql}",
+                filter_params
+            )
+            plan = cursor.fetchall()
+            total = int(plan[0].get('rows') or 0) if plan else 0
 
-        cursor.execute(count_query, count_params)
-        total = cursor.fetchone()['total']
+        if total is not None:
+            pagination["total"] = total
+            pagination["total_is_approximate"] = count_mode == 'approx'
+            pagination["total_pages"] = (total + per_page - 1) // per_page
 
         return jsonify({
             "students": students,
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total": total,
-                "total_pages": (total + per_page - 1) // per_page
-            }
+            "pagination": pagination
         })
 
     except Exception as e:
@@ -483,12 +577,7 @@ def get_students():
         if 'conn' in locals():
             conn.close()
 
-# Add this to your app initialization to cleanup tokens periodically
-# Example with APScheduler:
-# from apscheduler.schedulers.background import BackgroundScheduler
-# scheduler = BackgroundScheduler()
-# scheduler.add_job(cleanup_expired_tokens, 'interval', hours=1)
-# scheduler.start()
+# cleanup_expired_tokens is scheduled from app.py via utils.scheduler
 
 def token_required(f):
     @wraps(f)
@@ -505,7 +594,7 @@ def token_required(f):
 
         try:
             # ✅ Use app config secret
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            data = token_verifier.verify(token)
 
             current_user = {
                 "id": data["user_id"],
@@ -540,6 +629,7 @@ def update_profile(current_user):
             UPDATE users SET name=%s, email=%s WHERE id=%s
         """, (name, email, current_user['id']))
         conn.commit()
+        user_directory.invalidate(current_user['id'])
 
         return jsonify({"message": "Profile updated successfully"}), 200
 
@@ -567,19 +657,21 @@ def change_password(current_user):
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute("SELECT hashed_password FROM users WHERE id = %s", (current_user['id'],))
-        user = cursor.fetchone()
+        user = user_directory.get_by_id(cursor, current_user['id'])
 
-        if not user or not check_password_hash(user['hashed_password'], current_password):
+        if not user or not password_hasher.verify(user.hashed_password, current_password):
             return jsonify({"error": "Incorrect current password"}), 401
 
-        new_hashed = generate_password_hash(new_password)
+        new_hashed = password_hasher.hash(new_password)
 
         cursor.execute("UPDATE users SET hashed_password = %s WHERE id = %s", (new_hashed, current_user['id']))
         conn.commit()
+        user_directory.invalidate(current_user['id'])
 
         return jsonify({"message": "Password updated successfully"}), 200
 
+    except PasswordPoolSaturated as e:
+        return hashing_unavailable(e)
     except Exception as e:
         current_app.logger.error(f"Password change error: {str(e)}")
         return jsonify({"error": "Failed to change password"}), 500
@@ -630,6 +722,7 @@ def upload_avatar(current_user):
             (avatar_path, current_user['id'])
         )
         conn.commit()
+        user_directory.invalidate(current_user['id'])
         
         # Return full URL
         full_url = f"{request.host_url.rstrip('/')}{avatar_path}"
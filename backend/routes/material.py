@@ -4,6 +4,8 @@ from contextlib import closing
 import mysql.connector
 import os
 from werkzeug.utils import secure_filename
+from utils.cache import invalidate, conditional_get
+from utils import progress_aggregates
 
 bp = Blueprint('material', __name__, url_prefix='/api/material')
 
@@ -75,13 +77,17 @@ def upload_material():
                     data['subject_id']
                 )
                 
+                conn.start_transaction()
                 cursor.execute(sql, params)
+                material_id = cursor.lastrowid
+                progress_aggregates.apply_material_added(cursor, data['subject_id'])
                 conn.commit()
+                invalidate('materials')
                 
                 return jsonify({
                     "status": "success",
                     "message": "Material uploaded successfully",
-                    "material_id": cursor.lastrowid,
+                    "material_id": material_id,
                     "file_url": url
                 }), 201
 
@@ -101,6 +107,7 @@ def upload_material():
 
 
 @bp.route('/materials', methods=['GET'])
+@conditional_get(tags=['materials'])
 def get_all_materials():
     try:
         with closing(get_db_connection()) as conn:
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from database.db import get_db_connection
 from utils.tokens_utils import role_required
+from utils.cache import cached_response, invalidate
+from utils import progress_aggregates
 from datetime import datetime, timedelta
 import re
 
@@ -34,14 +36,20 @@ def update_progress():
         cursor = conn.cursor(dictionary=True)
 
         # Check material exists
-        cursor.execute("SELECT id FROM study_materials WHERE id = %s", (material_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT id, subject_id FROM study_materials WHERE id = %s", (material_id,))
+        material = cursor.fetchone()
+        if not material:
             return jsonify({'error': 'Material not found'}), 404
 
+        # Progress row and aggregates change together
+        conn.start_transaction()
+        progress_aggregates.lock_for_progress_change(cursor, material['subject_id'])
+
         # Check existing progress
         cursor.execute("""
-            SELECT id FROM user_progress 
+            SELECT id, status FROM user_progress 
             WHERE user_email = %s AND material_id = %s
+            FOR UPDATE
             """, (user_email, material_id))
         existing = cursor.fetchone()
 
@@ -62,7 +70,17 @@ def update_progress():
                 """, (user_email, material_id, status))
             progress_id = cursor.lastrowid
 
+        progress_aggregates.apply_progress_change(
+            cursor,
+            user_email,
+            material_id,
+            material['subject_id'],
+            existing['status'] if existing else None,
+            status
+        )
+
         conn.commit()
+        invalidate(f'progress:{user_email}')
         return jsonify({
             'message': 'Progress updated successfully',
             'progress_id': progress_id
@@ -80,6 +98,7 @@ def update_progress():
 
 @bp.route('/<string:user_email>', methods=['GET'])
 @role_required(['student'])
+@cached_response(tags=['progress:{user_email}'])
 def get_user_progress(user_email):
     if not validate_email(user_email):
         return jsonify({'error': 'Invalid email format'}), 400
@@ -124,6 +143,7 @@ def get_user_progress(user_email):
 
 @bp.route('/summary/<string:user_email>', methods=['GET'])
 @role_required(['student'])
+@cached_response(tags=['progress:{user_email}', 'materials'])
 def get_progress_summary(user_email):
     if not validate_email(user_email):
         return jsonify({'error': 'Invalid email format'}), 400
@@ -138,16 +158,16 @@ def get_progress_summary(user_email):
             SELECT 
                 s.id AS subject_id,
                 s.name AS subject_name,
-                COUNT(sm.id) AS total_materials,
-                COALESCE(SUM(CASE WHEN up.status = 'Completed' THEN 1 ELSE 0 END), 0) AS completed_materials,
+                COALESCE(ps.total_materials, 0) AS total_materials,
+                COALESCE(ssp.completed, 0) AS completed_materials,
                 ROUND(
-                    COALESCE(SUM(CASE WHEN up.status = 'Completed' THEN 1 ELSE 0 END), 0) / 
-                    GREATEST(COUNT(sm.id), 1) * 100
+                    COALESCE(ssp.completed, 0) / 
+                    GREATEST(COALESCE(ps.total_materials, 0), 1) * 100
                 ) AS completion_percentage
             FROM subjects s
-            LEFT JOIN study_materials sm ON s.id = sm.subject_id
-            LEFT JOIN user_progress up ON sm.id = up.material_id AND up.user_email = %s
-            GROUP BY s.id, s.name
+            LEFT JOIN subject_progress_stats ps ON ps.subject_id = s.id
+            LEFT JOIN student_subject_progress ssp
+                ON ssp.subject_id = s.id AND ssp.user_email = %s
             ORDER BY completion_percentage DESC
             """, (user_email,))
 
@@ -171,6 +191,7 @@ def get_progress_summary(user_email):
 
 @bp.route('/recent/<string:user_email>', methods=['GET'])
 @role_required(['student'])
+@cached_response(tags=['progress:{user_email}'])
 def get_recent_materials(user_email):
     if not validate_email(user_email):
         return jsonify({'error': 'Invalid email format'}), 400
@@ -216,6 +237,7 @@ def get_recent_materials(user_email):
 
 @bp.route('/stats/<string:user_email>', methods=['GET'])
 @role_required(['student', 'teacher'])
+@cached_response(tags=['progress:{user_email}', 'materials'])
 def get_progress_stats(user_email):
     # Validate email format
     if not validate_email(user_email):
@@ -299,18 +321,16 @@ def get_subject_progress():
             SELECT 
                 s.id AS subject_id,
                 s.name AS subject_name,
-                COUNT(DISTINCT sm.id) AS total_materials,
-                COUNT(DISTINCT up.material_id) AS accessed_materials,
-                COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN up.material_id END) AS completed_materials,
-                COUNT(DISTINCT up.user_email) AS active_students,
+                COALESCE(ps.total_materials, 0) AS total_materials,
+                COALESCE(ps.accessed_materials, 0) AS accessed_materials,
+                COALESCE(ps.completed_materials, 0) AS completed_materials,
+                COALESCE(ps.active_students, 0) AS active_students,
                 ROUND(
-                    COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN up.material_id END) / 
-                    GREATEST(COUNT(DISTINCT sm.id), 1) * 100
+                    COALESCE(ps.completed_materials, 0) / 
+                    GREATEST(COALESCE(ps.total_materials, 0), 1) * 100
                 ) AS completion_percentage
             FROM subjects s
-            LEFT JOIN study_materials sm ON s.id = sm.subject_id
-            LEFT JOIN user_progress up ON sm.id = up.material_id
-            GROUP BY s.id, s.name
+            LEFT JOIN subject_progress_stats ps ON ps.subject_id = s.id
             ORDER BY completion_percentage DESC
             """)
 
@@ -428,63 +448,60 @@ def get_dashboard_stats():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        # 1. Overall statistics - Fixed CROSS JOIN issues
+        # 1. Overall statistics - completions come from the per-student
+        # aggregates, which (like total_materials) include materials without a subject
         cursor.execute("""
             SELECT 
                 (SELECT COUNT(*) FROM users WHERE role = 'student') AS total_students,
                 (SELECT COUNT(*) FROM subjects) AS total_subjects,
                 (SELECT COUNT(*) FROM study_materials) AS total_materials,
-                COALESCE(AVG(
-                    (SELECT COUNT(*) FROM user_progress up 
-                     WHERE up.user_email = u.email AND up.status = 'Completed') / 
-                    GREATEST((SELECT COUNT(*) FROM study_materials), 1) * 100
-                ), 0) AS avg_completion
-            FROM users u
-            WHERE u.role = 'student'
+                COALESCE(SUM(sps.completed), 0) AS completions
+            FROM student_progress_stats sps
+            JOIN users u ON u.email = sps.user_email AND u.role = 'student'
         """)
         overview = cursor.fetchone()
-
-        # 2. Subject-wise progress - No changes needed here
+        total_students = int(overview['total_students'])
+        total_materials = int(overview['total_materials'])
+        overview['avg_completion'] = (
+            float(overview['completions']) / total_students / max(total_materials, 1) * 100
+            if total_students else 0
+        )
+
+        # 2. Subject-wise progress
         cursor.execute("""
             SELECT 
                 s.id, 
                 s.name,
-                COUNT(DISTINCT sm.id) AS total_materials,
-                COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN sm.id END) AS completed,
+                COALESCE(ps.total_materials, 0) AS total_materials,
+                COALESCE(ps.completed_materials, 0) AS completed,
                 ROUND(
-                    COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN sm.id END) / 
-                    GREATEST(COUNT(DISTINCT sm.id), 1) * 100, 1
+                    COALESCE(ps.completed_materials, 0) / 
+                    GREATEST(COALESCE(ps.total_materials, 0), 1) * 100, 1
                 ) AS completion_rate
             FROM subjects s
-            LEFT JOIN study_materials sm ON s.id = sm.subject_id
-            LEFT JOIN user_progress up ON sm.id = up.material_id
-            GROUP BY s.id
+            LEFT JOIN subject_progress_stats ps ON ps.subject_id = s.id
             ORDER BY completion_rate DESC
             LIMIT 5
         """)
         top_subjects = cursor.fetchall()
 
-        # 3. Student progress - Added material counts and fixed last_activity
+        # 3. Student progress - most recently active students first
         cursor.execute("""
             SELECT 
                 u.id,
                 u.name,
                 u.email,
-                (SELECT COUNT(*) FROM study_materials) AS total_materials,
-                COUNT(DISTINCT up.material_id) AS materials_accessed,
-                COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN up.material_id END) AS completed,
-                COALESCE(MAX(up.updated_at), u.created_at) AS last_activity,
-                ROUND(
-                    COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN up.material_id END) / 
-                    GREATEST((SELECT COUNT(*) FROM study_materials), 1) * 100, 1
-                ) AS completion_percentage
-            FROM users u
-            LEFT JOIN user_progress up ON u.email = up.user_email
+                %s AS total_materials,
+                sps.materials_accessed,
+                sps.completed,
+                sps.last_activity,
+                ROUND(sps.completed / GREATEST(%s, 1) * 100, 1) AS completion_percentage
+            FROM student_progress_stats sps
+            JOIN users u ON u.email = sps.user_email
             WHERE u.role = 'student'
-            GROUP BY u.id
-            ORDER BY last_activity DESC
+            ORDER BY sps.last_activity DESC
             LIMIT 10
-        """)
+        """, (total_materials, total_materials))
         recent_students = cursor.fetchall()
 
         return jsonify({
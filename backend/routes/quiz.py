@@ -1,12 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for, stream_with_context
 from database.db import get_db_connection
 from models.quiz import Quiz
+from utils.cache import invalidate, conditional_get
+from utils.rate_limit import limiter, client_identity, GENERATION_COST
+from utils.answer_keys import answer_keys, DIFFICULTY_BANDS, QUIZ_SAMPLE_SIZE, QUIZ_SAMPLE_MAX
+from utils import quiz_import, quiz_generator, quiz_responses, score_histogram
+from utils.score_histogram import score_distributions
+from utils.quiz_jobs import quiz_jobs, JobLimitExceeded, QUIZ_JOB_POLL_INTERVAL
+from utils.question_stock import question_stock
+from utils.tokens_utils import role_required
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import json
 import logging
-from openai import OpenAI  # OpenRouter uses OpenAI-compatible API
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -17,21 +24,49 @@ load_dotenv()
 
 bp = Blueprint('quiz', __name__, url_prefix='/api/quiz')
 
-# Initialize OpenRouter client
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Columns a client may ask for with ?fields=; id is always included
+QUESTION_FIELDS = ('id', 'topic', 'question', 'option_a', 'option_b',
+                   'option_c', 'option_d', 'correct_option',
+                   'difficulty', 'discrimination', 'calibration_responses')
+QUESTION_PAGE_SIZE = 100
+QUESTION_PAGE_MAX = 500
+QUESTION_EXPORT_BATCH = 1000
+
+def question_columns(fields):
+    """Validated column list for a ?fields= value (all columns when empty)"""
+    if not fields:
+        return list(QUESTION_FIELDS)
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in QUESTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return ['id'] + [field for field in dict.fromkeys(requested) if field != 'id']
+
+def fetch_question_page(cursor, columns, topic, after_id, limit):
+    """One keyset page of quiz_questions in id order, optionally for one topic"""
+    query = f"SELECT {', '.join(columns)} FROM quiz_questions WHERE id > %s"
+    params = [after_id]
+    if topic:
+        # Served by idx_quiz_questions_topic_id (topic, id)
+        query += " AND topic = %s"
+        params.append(topic)
+    query += " ORDER BY id LIMIT %s"
+    params.append(limit)
+    cursor.execute(query, params)
+    return cursor.fetchall()
 
 # ======================
 # Quiz Routes
 # ======================
 
 @bp.route('/questions/<topic>', methods=['GET'])
+@conditional_get(tags=['quiz_questions'])
 def get_questions_by_topic(topic):
     """Get all questions for a specific topic"""
     try:
+        version = answer_keys.version()
         questions = Quiz.get_questions_by_topic(topic)
+        answer_keys.prime(topic, questions, version)
         return jsonify({
             "status": "success",
             "count": len(questions),
@@ -41,25 +76,166 @@ def get_questions_by_topic(topic):
         logger.error(f"Error getting questions by topic: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/sample/<topic>', methods=['GET'])
+def sample_questions(topic):
+    """Random quiz for a topic: ?n= questions (default 10) without answers.
+
+    Ids are drawn from the cached answer key, so only the sampled rows are
+    read; correct options stay on the server and are checked by /submit.
+    ?difficulty=easy|medium|hard only draws calibrated questions in that band.
+    """
+    try:
+        n = int(request.args.get('n', QUIZ_SAMPLE_SIZE))
+    except ValueError:
+        return jsonify({"error": "'n' must be an integer"}), 400
+    if not 1 <= n <= QUIZ_SAMPLE_MAX:
+        return jsonify({"error": f"'n' must be between 1 and {QUIZ_SAMPLE_MAX}"}), 400
+    difficulty = request.args.get('difficulty')
+    if difficulty is not None and difficulty not in DIFFICULTY_BANDS:
+        return jsonify({
+            "error": f"'difficulty' must be one of {', '.join(DIFFICULTY_BANDS)}"
+        }), 400
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            question_ids = answer_keys.sample(cursor, topic, n, DIFFICULTY_BANDS.get(difficulty))
+            questions = []
+            if question_ids:
+                placeholders = ", ".join(["%s"] * len(question_ids))
+                cursor.execute(f"""
+                    SELECT id, topic, question, option_a, option_b, option_c, option_d
+                    FROM quiz_questions
+                    WHERE id IN ({placeholders})
+                """, question_ids)
+                by_id = {row['id']: row for row in cursor.fetchall()}
+                # Keep the sampled order; ids deleted since the key was loaded drop out
+                questions = [by_id[question_id] for question_id in question_ids
+                             if question_id in by_id]
+        finally:
+            cursor.close()
+            conn.close()
+        response = jsonify({
+            "status": "success",
+            "count": len(questions),
+            "data": questions
+        })
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Error sampling questions: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route('/questions', methods=['GET'])
+@conditional_get(tags=['quiz_questions'])
 def get_all_questions():
-    """Get all quiz questions"""
+    """List quiz questions one page at a time.
+
+    Query parameters: topic, fields (comma separated columns), limit
+    (default 100, max 500) and cursor (next_cursor of the previous page).
+    """
+    try:
+        columns = question_columns(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    topic = request.args.get('topic', default=None, type=str)
+    limit = max(1, min(request.args.get('limit', default=QUESTION_PAGE_SIZE, type=int),
+                       QUESTION_PAGE_MAX))
+    try:
+        after_id = int(request.args.get('cursor') or 0)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM quiz_questions")
-        questions = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        try:
+            questions = fetch_question_page(cursor, columns, topic, after_id, limit + 1)
+        finally:
+            cursor.close()
+            conn.close()
+
+        has_more = len(questions) > limit
+        questions = questions[:limit]
         return jsonify({
             "status": "success",
             "count": len(questions),
-            "data": questions
+            "data": questions,
+            "has_more": has_more,
+            "next_cursor": str(questions[-1]['id']) if has_more else None
         })
     except Exception as e:
         logger.error(f"Error getting all questions: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/topics', methods=['GET'])
+@conditional_get(tags=['quiz_questions'])
+def get_topics():
+    """Topics with their question counts (one GROUP BY on the topic index)"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT topic, COUNT(*) AS questions
+                FROM quiz_questions
+                WHERE topic IS NOT NULL
+                GROUP BY topic
+                ORDER BY topic
+            """)
+            topics = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return jsonify({
+            "status": "success",
+            "count": len(topics),
+            "data": topics
+        })
+    except Exception as e:
+        logger.error(f"Error getting quiz topics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/export/questions', methods=['GET'])
+@role_required(['admin'])
+def export_questions():
+    """Stream the question bank as NDJSON (one question per line).
+
+    Accepts the same topic and fields parameters as /questions. Rows are
+    read in keyset batches, so memory stays flat however large the bank.
+    """
+    try:
+        columns = question_columns(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    topic = request.args.get('topic', default=None, type=str)
+
+    def generate():
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            after_id = 0
+            while True:
+                batch = fetch_question_page(cursor, columns, topic, after_id, QUESTION_EXPORT_BATCH)
+                if not batch:
+                    break
+                yield ''.join(json.dumps(row) + '\n' for row in batch)
+                after_id = batch[-1]['id']
+        except Exception as e:
+            logger.error(f"Question export failed: {str(e)}")
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    filename = f"quiz_questions_{topic}.ndjson" if topic else "quiz_questions.ndjson"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @bp.route('/add', methods=['POST'])
 def add_question():
     """Add a new quiz question manually"""
@@ -75,6 +251,7 @@ def add_question():
             option_d=data['option_d'],
             correct_option=data['correct_option']
         )
+        invalidate('quiz_questions')
         return jsonify({"message": "Question added successfully"}), 201
     except KeyError as e:
         logger.error(f"Missing field in add question: {str(e)}")
@@ -83,6 +260,41 @@ def add_question():
         logger.error(f"Error adding question: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/add/bulk', methods=['POST'])
+def add_questions_bulk():
+    """Add many quiz questions in one transaction.
+
+    Accepts JSON, CSV or JSONL (see utils/quiz_import.py). Invalid rows are
+    reported per row; with ?atomic=true any invalid row aborts the import.
+    """
+    atomic = request.args.get('atomic', 'false').lower() == 'true'
+    try:
+        default_topic, rows, parse_errors = quiz_import.read_payload(request)
+        questions, errors = quiz_import.validate(rows, default_topic, parse_errors)
+    except quiz_import.QuizImportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not questions or (atomic and errors):
+        return jsonify({
+            "error": "No questions imported",
+            "inserted": 0,
+            "failed": len(errors),
+            "errors": errors
+        }), 400
+
+    try:
+        inserted = Quiz.add_questions(questions)
+        invalidate('quiz_questions')
+        return jsonify({
+            "status": "success",
+            "inserted": inserted,
+            "failed": len(errors),
+            "errors": errors
+        }), 201
+    except Exception as e:
+        logger.error(f"Error importing questions: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route('/upcoming', methods=['GET'])
 def get_upcoming_quizzes():
     """Get quizzes scheduled in the future"""
@@ -123,30 +335,33 @@ def submit_quiz():
         cursor = conn.cursor(dictionary=True)
 
         # Calculate score
-        score = 0
-        for answer in data['answers']:
-            cursor.execute("""
-                SELECT correct_option FROM quiz_questions WHERE id = %s
-            """, (answer['question_id'],))
-            correct = cursor.fetchone()
-            if correct and correct['correct_option'] == answer['selected']:
-                score += 1
+        checked = answer_keys.check(cursor, data['topic'], data['answers'])
+        score = sum(1 for _, is_correct in checked if is_correct)
 
         # Store result
         total = len(data['answers'])
         percentage = int((score / total) * 100) if total > 0 else 0
 
-        # FIXED SQL: Only 3 columns, 3 values
-        cursor.execute("""
-            INSERT INTO quiz_results 
-            (user_email, topic, score) 
-            VALUES (%s, %s, %s)
-        """, (data['user_email'], data['topic'], percentage))
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-        result_id = cursor.lastrowid
+        try:
+            # The result, its histogram bin and its per-answer log commit together
+            conn.start_transaction()
+            # FIXED SQL: Only 3 columns, 3 values
+            cursor.execute("""
+                INSERT INTO quiz_results 
+                (user_email, topic, score) 
+                VALUES (%s, %s, %s)
+            """, (data['user_email'], data['topic'], percentage))
+            result_id = cursor.lastrowid
+            score_histogram.record(cursor, data['topic'], percentage)
+            quiz_responses.record(cursor, result_id, data['answers'], checked)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        score_distributions.forget(data['topic'])
         return jsonify({
             "status": "success",
             "score": percentage,
@@ -162,6 +377,46 @@ def submit_quiz():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.route('/percentile/<topic>', methods=['GET'])
+def get_score_percentile(topic):
+    """Where ?score= (0-100) stands among all attempts at topic"""
+    score = request.args.get('score', default=None, type=int)
+    if score is None or not 0 <= score <= score_histogram.MAX_SCORE:
+        return jsonify({"error": "'score' must be an integer between 0 and 100"}), 400
+    try:
+        distribution = score_distributions.get(topic)
+        if not distribution.total:
+            return jsonify({"error": "No attempts recorded for this topic"}), 404
+        below, at, above = distribution.rank(score)
+        return jsonify({
+            "status": "success",
+            "topic": topic,
+            "score": score,
+            "attempts": distribution.total,
+            "below": below,
+            "at": at,
+            "above": above,
+            "percentile": round(distribution.percentile(score), 1),
+            # "Top 20%": share of attempts that scored at least as well
+            "top_percent": round(100 * (at + above) / distribution.total, 1)
+        })
+    except Exception as e:
+        logger.error(f"Error getting score percentile: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/stats/<topic>', methods=['GET'])
+def get_topic_score_stats(topic):
+    """Score statistics for a topic; ?histogram=true adds the 101 bins"""
+    try:
+        distribution = score_distributions.get(topic)
+        stats = distribution.stats()
+        if request.args.get('histogram', 'false').lower() == 'true':
+            stats['histogram'] = distribution.counts
+        return jsonify({"status": "success", "topic": topic, "data": stats})
+    except Exception as e:
+        logger.error(f"Error getting topic score stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route('/results/<user_email>', methods=['GET'])
 def get_user_results(user_email):
     """Get all quiz results for a specific user"""
@@ -195,8 +450,19 @@ def get_user_results(user_email):
 # ======================
 
 @bp.route('/generate', methods=['POST'])
+@limiter.cost(GENERATION_COST)
 def generate_question():
-    """Generate quiz questions using OpenRouter.ai"""
+    """Queue AI generation of quiz questions (OpenRouter.ai)
+
+    Answers 201 with the questions when the topic has enough in stock,
+    otherwise 202 with a job id; poll GET /api/quiz/generate/<job_id>.
+    Expected JSON payload:
+    {
+        "topic": "Algebra",
+        "count": 10 (optional, default 1),
+        "temperature": 0.7 (optional)
+    }
+    """
     # Request validation
     if not request.is_json:
         return jsonify({"error": "Content-Type must be application/json"}), 415
@@ -204,129 +470,81 @@ def generate_question():
     data = request.get_json()
     if not data or 'topic' not in data:
         return jsonify({"error": "Missing required 'topic' field"}), 400
-    
+
+    topic = str(data['topic']).strip()
     try:
-        # Debug: Log incoming request
-        logger.info(f"Incoming request data: {data}")
-        
-        # Generate prompt
-        prompt = f"""Generate a {data['topic']} multiple-choice quiz question in strict JSON format:
-        {{
-            "question": "Question text?",
-            "options": {{
-                "A": "Option A",
-                "B": "Option B",
-                "C": "Option C",
-                "D": "Option D"
-            }},
-            "answer": "A"
-        }}"""
-        
-        # Safely handle parameters
-        try:
-            temperature = float(data.get("temperature", 0.7))
-            temperature = max(0.1, min(temperature, 1.0))  # Clamp value
-        except (TypeError, ValueError) as e:
-            logger.warning(f"Invalid temperature, using default. Error: {str(e)}")
-            temperature = 0.7
-
-        # Debug: Log API call parameters
-        logger.info(f"Calling OpenRouter with temperature: {temperature}")
-        
-        # Make API request
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-r1-0528:free",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Return ONLY valid JSON matching the exact requested format."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=temperature,
-            max_tokens=300
-        )
+        count = int(data.get("count", 1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'count' must be an integer"}), 400
+    if not 1 <= count <= quiz_generator.QUIZ_GENERATION_MAX_COUNT:
+        return jsonify({
+            "error": f"'count' must be between 1 and {quiz_generator.QUIZ_GENERATION_MAX_COUNT}"
+        }), 400
 
-        # Debug: Log raw response
-        logger.info(f"Raw API response: {response}")
-        
-        # Parse response
-        content = response.choices[0].message.content
-        try:
-            question_data = json.loads(content)
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse JSON: {content}")
-            return jsonify({
-                "error": "AI returned invalid JSON",
-                "raw_response": content
-            }), 500
-
-        # Validate structure
-        required = {
-            'question': str,
-            'options': dict,
-            'answer': str
-        }
-        
-        for field, field_type in required.items():
-            if field not in question_data:
-                raise ValueError(f"Missing required field: {field}")
-            if not isinstance(question_data[field], field_type):
-                raise ValueError(f"Field {field} has wrong type")
-        
-        if question_data['answer'] not in ['A', 'B', 'C', 'D']:
-            raise ValueError("Answer must be A, B, C, or D")
+    # Safely handle parameters
+    try:
+        temperature = float(data.get("temperature", 0.7))
+        temperature = max(0.1, min(temperature, 1.0))  # Clamp value
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Invalid temperature, using default. Error: {str(e)}")
+        temperature = 0.7
 
-        # Database operations
-        conn = None
-        cursor = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO quiz_questions 
-                (topic, question, option_a, option_b, option_c, option_d, correct_option) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    data['topic'],
-                    question_data['question'],
-                    question_data['options'].get('A', ''),
-                    question_data['options'].get('B', ''),
-                    question_data['options'].get('C', ''),
-                    question_data['options'].get('D', ''),
-                    question_data['answer']
-                ))
-            conn.commit()
-            
-            return jsonify({
-                "status": "success",
-                "data": question_data,
-                "model": "deepseek-r1-0528:free"
-            }), 201
-            
-        except Exception as db_error:
-            if conn:
-                conn.rollback()
-            logger.error(f"Database error: {str(db_error)}")
-            raise db_error
-            
+    # Popular topics are usually answered straight from pre-generated stock
+    try:
+        stocked = question_stock.take(topic, count)
     except Exception as e:
-        logger.error(f"Generation failed: {str(e)}", exc_info=True)
+        logger.warning(f"Question stock unavailable: {str(e)}")
+        stocked = None
+    if stocked:
+        generated = [quiz_generator.to_generated_shape(q) for q in stocked]
+        return jsonify({
+            "status": "succeeded",
+            "source": "stock",
+            "data": generated[0] if count == 1 else generated,
+            "generated": len(generated),
+            "model": quiz_generator.QUIZ_MODEL
+        }), 201
+
+    try:
+        job_id = quiz_jobs.submit(client_identity(), topic, count, temperature)
+    except JobLimitExceeded as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = str(int(QUIZ_JOB_POLL_INTERVAL * 5))
+        return response, 429
+    except Exception as e:
+        logger.error(f"Failed to queue generation: {str(e)}", exc_info=True)
         return jsonify({
             "error": "Question generation failed",
             "details": str(e)
         }), 500
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+    status_url = url_for('quiz.get_generation_job', job_id=job_id)
+    response = jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": status_url
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+@bp.route('/generate/<job_id>', methods=['GET'])
+@limiter.limit("120/minute")  # polled while a job runs
+def get_generation_job(job_id):
+    """Status of a generation job; "result" holds the questions once it succeeded"""
+    try:
+        job = quiz_jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        if job['status'] == 'succeeded':
+            result = job['result']
+            # Same shape the synchronous endpoint used to return; every
+            # question may have been rejected, leaving data empty
+            if job['count'] == 1 and result['data']:
+                result['data'] = result['data'][0]
+        return jsonify(job)
+    except Exception as e:
+        logger.error(f"Error getting generation job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
 @bp.route('/results/id/<int:result_id>', methods=['GET'])
 def get_result_by_id(result_id):
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 import mysql.connector
 from datetime import datetime, timedelta, date
 from functools import wraps
+from utils.cache import cached_response, invalidate
+from utils.user_directory import user_directory
 
 bp = Blueprint('streak', __name__, url_prefix='/api/streak')
 
@@ -36,35 +38,28 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
-def calculate_streaks(dates):
-    if not dates:
-        return 0, 0
-    
-    dates = sorted(dates)
-    current_streak = 1
-    longest_streak = 1
-    previous_date = dates[0]
-    
-    for date in dates[1:]:
-        if (date - previous_date).days == 1:
-            current_streak += 1
-            longest_streak = max(longest_streak, current_streak)
-        elif (date - previous_date).days > 1:
-            current_streak = 1
-        previous_date = date
-    
-    today = datetime.now().date()
-    last_session = dates[-1]
-    
-    if last_session == today:
-        return current_streak, longest_streak
-    elif (today - last_session).days == 1:
-        return current_streak, longest_streak
-    else:
-        return 0, longest_streak
+def record_streak_day(cursor, user_id):
+    """Advance the user's streak state for today in O(1).
+
+    Assignments in ON DUPLICATE KEY UPDATE run left to right, so
+    longest_streak sees the already-updated current_streak.
+    """
+    cursor.execute("""
+        INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_active)
+        VALUES (%s, 1, 1, CURDATE())
+        ON DUPLICATE KEY UPDATE
+            current_streak = CASE
+                WHEN last_active = CURDATE() THEN current_streak
+                WHEN last_active = CURDATE() - INTERVAL 1 DAY THEN current_streak + 1
+                ELSE 1
+            END,
+            longest_streak = GREATEST(longest_streak, current_streak),
+            last_active = CURDATE()
+    """, (user_id,))
 
 @bp.route('/<int:user_id>', methods=['GET'])
 @token_required
+@cached_response(tags=['streak:{user_id}'])
 def get_streak(user_id):
     conn = None
     cursor = None
@@ -72,17 +67,21 @@ def get_streak(user_id):
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
+        # A streak survives until the end of the day after the last session
         cursor.execute("""
-            SELECT DATE(session_date) as session_date 
-            FROM study_sessions 
+            SELECT 
+                CASE WHEN last_active >= CURDATE() - INTERVAL 1 DAY
+                     THEN current_streak ELSE 0 END AS current_streak,
+                longest_streak,
+                last_active
+            FROM user_streaks
             WHERE user_id = %s
-            ORDER BY session_date
         """, (user_id,))
         
-        dates = [row['session_date'] for row in cursor.fetchall()]
-        current_streak, longest_streak = calculate_streaks(dates)
-        
-        last_active = dates[-1] if dates else None
+        state = cursor.fetchone()
+        current_streak = state['current_streak'] if state else 0
+        longest_streak = state['longest_streak'] if state else 0
+        last_active = state['last_active'] if state else None
         
         return jsonify({
             "current_streak": current_streak,
@@ -120,6 +119,7 @@ def update_streak():
 
         conn = get_db_connection()
         cursor = conn.cursor()
+        conn.start_transaction()
 
         cursor.execute("""
             INSERT INTO study_sessions 
@@ -130,7 +130,9 @@ def update_streak():
             data.get('duration', 0),
             data.get('material', '')
         ))
+        record_streak_day(cursor, user_id)
         conn.commit()
+        invalidate(f'streak:{user_id}')
 
         return jsonify({
             "message": "Study session recorded successfully",
@@ -161,11 +163,10 @@ def get_analytics(user_id):
         cursor = conn.cursor(dictionary=True)
 
         # Get user email first
-        cursor.execute("SELECT email FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = user_directory.get_by_id(cursor, user_id)
         if not user:
             return jsonify({"error": "User not found", "status": "error"}), 404
-        user_email = user['email']
+        user_email = user.email
 
         # Daily progress
         end_date = date.today()
@@ -277,11 +278,10 @@ def get_stats(user_id):
         cursor = conn.cursor(dictionary=True)
 
         # Get user email first
-        cursor.execute("SELECT email FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = user_directory.get_by_id(cursor, user_id)
         if not user:
             return jsonify({"error": "User not found", "status": "error"}), 404
-        user_email = user['email']
+        user_email = user.email
 
         # Total materials count
         cursor.execute("SELECT COUNT(*) as total FROM subject_materials")
@@ -0,0 +1,155 @@
+"""Quiz generation against llm_stub_server.py running in-process.
+
+    cd backend && python -m pytest tests
+"""
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("flask")
+pytest.importorskip("mysql.connector")
+
+from openai import OpenAI
+
+import llm_stub_server
+from utils import quiz_generator
+from utils.quiz_generator import (
+    GenerationError, existing_questions, generate_questions, parse_questions
+)
+
+
+def question(text, answer='A', **overrides):
+    raw = {
+        "question": text,
+        "options": {key: f"{text} option {key}" for key in 'ABCD'},
+        "answer": answer
+    }
+    raw.update(overrides)
+    return raw
+
+
+class FakeCursor:
+    """Tuple cursor answering existing_questions()"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), llm_stub_server.StubHandler)
+    server.latency = 0.0
+    server.token_delay = 0.0
+    server.cancelled_streams = 0
+    server.verbose = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub_client(stub_server, monkeypatch):
+    host, port = stub_server.server_address
+    client = OpenAI(base_url=f"http://{host}:{port}/v1", api_key="stub", timeout=10)
+    monkeypatch.setattr(quiz_generator, 'client', client)
+    monkeypatch.setattr(quiz_generator, 'QUIZ_GENERATION_CACHE', False)
+    return client
+
+
+def stub_answers(monkeypatch, questions):
+    """Make every stub completion return the same question list"""
+    monkeypatch.setattr(llm_stub_server, 'fake_questions',
+                        lambda topic, count, seed: list(questions))
+
+
+def test_generates_requested_count(stub_client):
+    questions, rejected = generate_questions('Python', 12)
+
+    assert len(questions) == 12
+    assert rejected == 0
+    assert len({q[1].lower() for q in questions}) == 12
+    for topic, text, *options, answer in questions:
+        assert topic == 'Python'
+        assert text and all(options)
+        assert answer in 'ABCD'
+
+
+def test_batches_run_concurrently(stub_server, stub_client, monkeypatch):
+    monkeypatch.setattr(quiz_generator, 'QUIZ_GENERATION_BATCH_SIZE', 2)
+    monkeypatch.setattr(quiz_generator, 'QUIZ_GENERATION_CONCURRENCY', 4)
+    stub_server.latency = 0.5
+
+    started = time.perf_counter()
+    questions, _ = generate_questions('SQL', 8)
+    elapsed = time.perf_counter() - started
+
+    # Four batches of two; one after another they would take 2 seconds
+    assert len(questions) == 8
+    assert elapsed < 1.5
+
+
+def test_skips_stored_and_repeated_questions(stub_client, monkeypatch):
+    stub_answers(monkeypatch, [
+        question("What is a list?"),
+        question("What is a tuple?"),
+        question("  WHAT IS A TUPLE?  ", answer='B'),
+        question("What is a set?")
+    ])
+    cursor = FakeCursor([("What is a list?",), ("What is a dict?",)])
+
+    exclude = existing_questions(cursor, 'Python')
+    questions, rejected = generate_questions('Python', 4, exclude=exclude)
+
+    assert cursor.executed[0][1] == ('Python',)
+    assert exclude == {"what is a list?", "what is a dict?"}
+    assert [q[1] for q in questions] == ["What is a tuple?", "What is a set?"]
+    # The stored and the repeated question, then all four again on the retry round
+    assert rejected == 2 + 4 * quiz_generator.QUIZ_GENERATION_RETRIES
+
+
+def test_rejects_malformed_questions(stub_client, monkeypatch):
+    stub_answers(monkeypatch, [
+        "not an object",
+        question("Missing an option?", options={"A": "1", "B": "2", "C": "3"}),
+        question("Answer out of range?", answer='E'),
+        question(""),
+        question("Well formed?", answer='c')
+    ])
+
+    questions, rejected = generate_questions('Python', 1)
+
+    assert questions == [('Python', "Well formed?", "Well formed? option A",
+                          "Well formed? option B", "Well formed? option C",
+                          "Well formed? option D", 'C')]
+    assert rejected == 4
+
+
+def test_fails_when_nothing_is_usable(stub_client, monkeypatch):
+    stub_answers(monkeypatch, [question("No answer?", answer='')])
+
+    with pytest.raises(GenerationError):
+        generate_questions('Python', 3)
+
+
+def test_parse_questions_shapes():
+    single = question("One?")
+    assert parse_questions('{"questions": []}') == []
+    assert parse_questions('[{"question": "Q?"}]') == [{"question": "Q?"}]
+    assert parse_questions(json.dumps(single)) == [single]
+    with pytest.raises(ValueError):
+        parse_questions('"just text"')
+    with pytest.raises(ValueError):
+        parse_questions('not json')
@@ -0,0 +1,202 @@
+"""In-process answer keys, one compact entry per quiz topic.
+
+A topic's question ids are held sorted in an ``array('i')`` with a parallel
+bytes buffer of correct options (b'A'..b'D'), so grading a submission is a
+few binary searches instead of a query. Entries are loaded lazily and carry
+the 'quiz_questions' tag version; /api/quiz/add and /api/quiz/generate bump
+that version through invalidate(), which makes every worker reload. Entries
+are also reloaded after ANSWER_KEY_TTL seconds, which bounds how long a
+worker misses a change made by another process (calibrate_questions.py)
+when the version lives in a per-process memory:// store.
+
+The same id array backs /api/quiz/sample: sample() draws quiz-sized random
+subsets without reading the topic's rows. A parallel ``array('f')`` holds
+each question's calibrated difficulty (NaN until calibrate_questions.py
+has seen enough responses), so a sample can be limited to a difficulty band.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from utils.cache import tag_versions
+from utils.shared_store import SharedStoreError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ANSWER_KEY_TOPICS = int(os.getenv('ANSWER_KEY_TOPICS', 256))
+QUIZ_SAMPLE_SIZE = int(os.getenv('QUIZ_SAMPLE_SIZE', 10))
+QUIZ_SAMPLE_MAX = int(os.getenv('QUIZ_SAMPLE_MAX', 50))
+ANSWER_KEY_TTL = int(os.getenv('ANSWER_KEY_TTL', 600))  # seconds
+
+QUIZ_QUESTIONS_TAG = 'quiz_questions'
+
+# Share of wrong answers, see utils/item_calibration.py
+DIFFICULTY_BANDS = {
+    'easy': (0.0, 0.3),
+    'medium': (0.3, 0.7),
+    'hard': (0.7, 1.0)
+}
+
+
+class TopicKey:
+    """Sorted question ids with their correct options and difficulty for one topic"""
+
+    __slots__ = ('ids', 'options', 'difficulty', 'version', 'expires_at')
+
+    def __init__(self, rows, version):
+        rows = sorted(
+            (row['id'], row['correct_option'], row.get('difficulty')) for row in rows
+        )
+        self.ids = array('i', (question_id for question_id, _, _ in rows))
+        self.options = ''.join(option for _, option, _ in rows).encode('ascii')
+        self.difficulty = array('f', (
+            float('nan') if difficulty is None else difficulty for _, _, difficulty in rows
+        ))
+        self.version = version
+        self.expires_at = time.monotonic() + ANSWER_KEY_TTL
+
+    def __len__(self):
+        return len(self.ids)
+
+    def correct_option(self, question_id):
+        index = bisect_left(self.ids, question_id)
+        if index < len(self.ids) and self.ids[index] == question_id:
+            return chr(self.options[index])
+        return None
+
+    def in_band(self, low, high):
+        """Ids whose difficulty lies in [low, high]; uncalibrated ones never match"""
+        return [question_id for question_id, difficulty in zip(self.ids, self.difficulty)
+                if low <= difficulty <= high]
+
+    def nbytes(self):
+        return (self.ids.itemsize * len(self.ids) + len(self.options)
+                + self.difficulty.itemsize * len(self.difficulty))
+
+
+class AnswerKeyStore:
+    def __init__(self, max_topics=ANSWER_KEY_TOPICS):
+        self.max_topics = max_topics
+        self._topics = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.fallbacks = 0
+        self.samples = 0
+
+    def version(self):
+        """Current quiz_questions version, or None if the shared store is down"""
+        try:
+            return tag_versions(QUIZ_QUESTIONS_TAG)[0]
+        except SharedStoreError as e:
+            logger.warning(f"Answer key version unavailable: {e}")
+            return None
+
+    def _store(self, topic, entry):
+        with self._lock:
+            self._topics[topic] = entry
+            self._topics.move_to_end(topic)
+            while len(self._topics) > self.max_topics:
+                self._topics.popitem(last=False)
+
+    def get(self, cursor, topic):
+        """TopicKey for topic, loading it with cursor when missing or stale"""
+        version = self.version()
+        with self._lock:
+            entry = self._topics.get(topic)
+            if entry is not None and version is not None and entry.version == version \
+                    and entry.expires_at > time.monotonic():
+                self._topics.move_to_end(topic)
+                self.hits += 1
+                return entry
+
+        cursor.execute("""
+            SELECT id, correct_option, difficulty FROM quiz_questions
+            WHERE topic = %s
+            ORDER BY id
+        """, (topic,))
+        entry = TopicKey(cursor.fetchall(), version)
+        self.loads += 1
+        if version is not None:
+            self._store(topic, entry)
+        return entry
+
+    def prime(self, topic, rows, version):
+        """Build a topic's entry from rows a caller already fetched.
+
+        version must have been read before the rows were.
+        """
+        if version is None:
+            return
+        self._store(topic, TopicKey(rows, version))
+
+    def sample(self, cursor, topic, n, band=None):
+        """Up to n distinct random question ids for topic, in random order.
+
+        band is a (low, high) difficulty range, e.g. DIFFICULTY_BANDS['hard'].
+        """
+        entry = self.get(cursor, topic)
+        self.samples += 1
+        ids = entry.ids if band is None else entry.in_band(*band)
+        return random.sample(ids, min(n, len(ids)))
+
+    def check(self, cursor, topic, answers):
+        """(question_id, is_correct) for each answer in a submission for topic.
+
+        question_id is None when the answer names no valid id. Answers for
+        questions outside the topic are looked up in one query.
+        """
+        entry = self.get(cursor, topic)
+        checked = []
+        missing = []
+        for answer in answers:
+            try:
+                question_id = int(answer['question_id'])
+            except (TypeError, ValueError):
+                checked.append((None, False))
+                continue
+            correct = entry.correct_option(question_id)
+            if correct is None:
+                missing.append((len(checked), question_id, answer['selected']))
+            checked.append((question_id, correct is not None and correct == answer['selected']))
+
+        if missing:
+            self.fallbacks += 1
+            question_ids = list({question_id for _, question_id, _ in missing})
+            placeholders = ", ".join(["%s"] * len(question_ids))
+            cursor.execute(f"""
+                SELECT id, correct_option FROM quiz_questions WHERE id IN ({placeholders})
+            """, question_ids)
+            answer_key = {row['id']: row['correct_option'] for row in cursor.fetchall()}
+            for index, question_id, selected in missing:
+                correct = answer_key.get(question_id)
+                # Ids that do not exist are not logged as responses
+                if correct is None:
+                    checked[index] = (None, False)
+                else:
+                    checked[index] = (question_id, correct == selected)
+        return checked
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._topics.values())
+        return {
+            'topics': len(entries),
+            'max_topics': self.max_topics,
+            'questions': sum(len(entry) for entry in entries),
+            'bytes': sum(entry.nbytes() for entry in entries),
+            'hits': self.hits,
+            'loads': self.loads,
+            'fallbacks': self.fallbacks,
+            'samples': self.samples
+        }
+
+
+answer_keys = AnswerKeyStore()
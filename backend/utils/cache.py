@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+from utils.shared_store import (
+    SharedStoreError, get_backend, current_versions, bump_version
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))  # seconds
+
+
+class TTLCache:
+    """Thread-safe mapping with per-entry expiry and LRU eviction"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class ResponseCache:
+    """Serialised responses kept in the shared store, with local hit counters"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        data = get_backend().get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        header, _, body = data.partition(b'\n')
+        meta = json.loads(header)
+        self.hits += 1
+        return tuple(meta['versions']), body, meta['status'], meta['mimetype']
+
+    def set(self, key, versions, body, status, mimetype, ttl=None):
+        header = json.dumps({'versions': versions, 'status': status, 'mimetype': mimetype})
+        get_backend().set(key, header.encode() + b'\n' + body, ttl or self.ttl)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+response_cache = ResponseCache(ttl=RESPONSE_CACHE_TTL)
+
+
+def _tag_name(tag):
+    return f"tag:{str(tag).strip().lower()}"
+
+
+def tag_versions(*tags):
+    """Current generation of each tag; cached entries remember these"""
+    return list(current_versions(*(_tag_name(tag) for tag in tags)))
+
+
+def invalidate(*tags):
+    """Mark every cached response carrying any of the given tags as stale"""
+    try:
+        for tag in tags:
+            bump_version(_tag_name(tag))
+    except SharedStoreError as e:
+        logger.error(f"Failed to invalidate cache tags {tags}: {e}")
+        return
+    logger.debug(f"Invalidated cache tags: {tags}")
+
+
+def _current_user_key():
+    """Identify the caller so cached responses are never shared across users"""
+    current_user = getattr(request, 'current_user', None)
+    if current_user:
+        return f"user:{current_user['id']}"
+
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        return "token:" + hashlib.sha256(auth_header.encode()).hexdigest()
+
+    return "anonymous"
+
+
+def cached_response(tags=(), ttl=None):
+    """Cache successful GET responses of a route.
+
+    Tags may reference view arguments, e.g. ``'progress:{user_email}'``.
+    Place the decorator below any auth decorator so the user is known.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            rendered_tags = [tag.format(**kwargs) for tag in tags]
+            key = "resp:" + hashlib.sha256(repr((
+                f.__module__,
+                f.__name__,
+                tuple(sorted(kwargs.items())),
+                request.query_string,
+                _current_user_key()
+            )).encode()).hexdigest()
+
+            try:
+                versions = tag_versions(*rendered_tags)
+                entry = response_cache.get(key)
+            except SharedStoreError as e:
+                logger.warning(f"Response cache unavailable: {e}")
+                return f(*args, **kwargs)
+
+            if entry is not None and list(entry[0]) == versions:
+                _, body, status, mimetype = entry
+                response = make_response(body, status)
+                response.mimetype = mimetype
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                try:
+                    response_cache.set(
+                        key, versions, response.get_data(),
+                        response.status_code, response.mimetype, ttl
+                    )
+                except SharedStoreError as e:
+                    logger.warning(f"Could not store cached response: {e}")
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+    return decorator
+
+
+def conditional_get(tags=(), cache_control='public, no-cache'):
+    """Serve 304 Not Modified while none of the given tags has changed.
+
+    The ETag is derived from the tag versions alone, so a matching
+    If-None-Match is answered without running the view or touching MySQL.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            rendered_tags = [tag.format(**kwargs) for tag in tags]
+            try:
+                versions = tag_versions(*rendered_tags)
+            except SharedStoreError as e:
+                logger.warning(f"ETag versions unavailable: {e}")
+                return f(*args, **kwargs)
+
+            etag = hashlib.sha1(repr((
+                f.__module__,
+                f.__name__,
+                tuple(sorted(kwargs.items())),
+                request.query_string,
+                versions
+            )).encode()).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        return wrapper
+    return decorator
@@ -0,0 +1,175 @@
+"""Background dependency probing for /health/live and /health/ready.
+
+Health endpoints never call a dependency themselves: a scheduled prober
+runs every registered check each HEALTH_PROBE_INTERVAL seconds and keeps a
+snapshot (status, last latency, last error and a short history per check).
+Only checks registered as critical decide readiness; the others (the LLM
+and YouTube APIs) just mark the app degraded.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import requests
+
+from utils.scheduler import run_every
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = int(os.getenv('HEALTH_PROBE_INTERVAL', 30))  # seconds
+HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', 5))  # seconds
+HEALTH_HISTORY_SIZE = int(os.getenv('HEALTH_HISTORY_SIZE', 20))
+
+# Query strings in error messages (requests quotes the URL, keys included)
+URL_QUERY = re.compile(r'\?[^\s\'"()]+')
+
+
+def redact(message):
+    """Error text safe for the unauthenticated health endpoints"""
+    return URL_QUERY.sub('?…', message)
+
+
+def mysql_check(connect):
+    """Check that borrows a connection via connect() and runs SELECT 1"""
+    def check():
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+    return check
+
+
+def http_check(url, headers=None, params=None, reachability_only=False):
+    """Check that expects a 2xx answer from a cheap GET.
+
+    With reachability_only any answer below 500 counts, which lets an API be
+    probed without credentials (and without spending its quota).
+    """
+    def check():
+        response = requests.get(url, headers=headers, params=params, timeout=HEALTH_PROBE_TIMEOUT)
+        limit = 500 if reachability_only else 400
+        if response.status_code >= limit:
+            raise RuntimeError(f"HTTP {response.status_code}")
+    return check
+
+
+class _CheckState:
+    def __init__(self, name, fn, critical):
+        self.name = name
+        self.fn = fn
+        self.critical = critical
+        self.status = 'unknown'
+        self.latency_ms = None
+        self.checked_at = None
+        self.last_error = None
+        self.consecutive_failures = 0
+        self.history = deque(maxlen=HEALTH_HISTORY_SIZE)
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "critical": self.critical,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "history": list(self.history)
+        }
+
+
+class HealthProber:
+    def __init__(self, interval=HEALTH_PROBE_INTERVAL):
+        self.interval = interval
+        self._checks = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.last_probe = None
+        self.app = None
+
+    def register(self, name, fn, critical=False):
+        with self._lock:
+            self._checks[name] = _CheckState(name, fn, critical)
+
+    def start(self, app):
+        """Probe now and then every interval seconds for this process"""
+        self.app = app
+        run_every('health-probe', self.interval, self.probe, app=app, initial_delay=0)
+
+    def _run_check(self, state):
+        started = time.perf_counter()
+        error = None
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    state.fn()
+            else:
+                state.fn()
+        except Exception as e:
+            error = redact(str(e)) or e.__class__.__name__
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        checked_at = datetime.now(timezone.utc).isoformat()
+
+        with self._lock:
+            state.latency_ms = latency_ms
+            state.checked_at = checked_at
+            state.history.append({"at": checked_at, "ok": error is None,
+                                  "latency_ms": latency_ms, "error": error})
+            if error is None:
+                state.status = 'up'
+                state.consecutive_failures = 0
+            else:
+                state.status = 'down'
+                state.last_error = error
+                state.consecutive_failures += 1
+        if error is not None:
+            logger.warning(f"Health check {state.name} failed: {error}")
+
+    def probe(self):
+        """Run every check concurrently and refresh the snapshot (scheduled job)"""
+        with self._lock:
+            states = list(self._checks.values())
+        threads = [threading.Thread(target=self._run_check, args=(state,), daemon=True)
+                   for state in states]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # A hung check keeps its previous status rather than stalling the rest
+            thread.join(HEALTH_PROBE_TIMEOUT * 2)
+        self.last_probe = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            checks = {name: state.to_dict() for name, state in self._checks.items()}
+        age = time.time() - self.last_probe if self.last_probe else None
+        stale = age is None or age > self.interval * 3
+        critical_down = [name for name, check in checks.items()
+                         if check['critical'] and check['status'] != 'up']
+        optional_down = [name for name, check in checks.items()
+                         if not check['critical'] and check['status'] == 'down']
+
+        if stale or critical_down:
+            status = 'unavailable'
+        elif optional_down:
+            status = 'degraded'
+        else:
+            status = 'ok'
+        return {
+            "status": status,
+            "ready": status != 'unavailable',
+            "snapshot_age_seconds": round(age, 1) if age is not None else None,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "checks": checks
+        }
+
+
+health_prober = HealthProber()
@@ -0,0 +1,100 @@
+"""Classical item analysis of quiz questions from quiz_responses.
+
+For every question with at least QUIZ_CALIBRATION_MIN_RESPONSES answers:
+
+difficulty       share of wrong answers, 0 (everyone right) to 1 (everyone wrong)
+discrimination   point-biserial correlation between answering this question
+                 correctly and the rest of the submission's score (the share of
+                 the other questions answered correctly). Near zero or negative
+                 usually means an ambiguous question or a wrong answer key.
+
+The response log is loaded into flat NumPy arrays and every statistic is a
+bincount over them, so a run is a handful of passes however many questions
+there are. Used by calibrate_questions.py; the web app never imports NumPy.
+"""
+import os
+
+import numpy as np
+
+QUIZ_CALIBRATION_MIN_RESPONSES = int(os.getenv('QUIZ_CALIBRATION_MIN_RESPONSES', 20))
+QUIZ_CALIBRATION_FETCH_SIZE = int(os.getenv('QUIZ_CALIBRATION_FETCH_SIZE', 50000))
+
+
+def load_responses(cursor):
+    """(result_ids, question_ids, correct) arrays for the whole response log"""
+    cursor.execute("SELECT result_id, question_id, is_correct FROM quiz_responses")
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(QUIZ_CALIBRATION_FETCH_SIZE)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+    if not chunks:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty.astype(np.float64)
+    data = np.concatenate(chunks)
+    return data[:, 0], data[:, 1], data[:, 2].astype(np.float64)
+
+
+def estimate(result_ids, question_ids, correct):
+    """Per-question statistics from parallel response arrays.
+
+    Returns (question_ids, responses, difficulty, discrimination); the
+    discrimination is NaN where it is undefined (no variance on either side).
+    """
+    _, result_index = np.unique(result_ids, return_inverse=True)
+    items, item_index = np.unique(question_ids, return_inverse=True)
+    n_items = len(items)
+
+    # Each submission's size and number correct, broadcast back to its responses
+    answered = np.bincount(result_index)[result_index]
+    total_correct = np.bincount(result_index, weights=correct)[result_index]
+
+    responses = np.bincount(item_index, minlength=n_items)
+    difficulty = 1.0 - np.bincount(item_index, weights=correct, minlength=n_items) / responses
+
+    # Rest score excludes the question itself; single-question submissions have none
+    usable = answered > 1
+    x = correct[usable]
+    rest = (total_correct[usable] - x) / (answered[usable] - 1)
+    index = item_index[usable]
+
+    n = np.bincount(index, minlength=n_items).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = np.bincount(index, weights=x, minlength=n_items) / n
+        mean_rest = np.bincount(index, weights=rest, minlength=n_items) / n
+        covariance = np.bincount(index, weights=x * rest, minlength=n_items) / n - mean_x * mean_rest
+        var_x = mean_x * (1.0 - mean_x)
+        var_rest = np.bincount(index, weights=rest * rest, minlength=n_items) / n - mean_rest ** 2
+        denominator = np.sqrt(var_x * var_rest)
+        discrimination = np.where(denominator > 1e-9, covariance / denominator, np.nan)
+
+    return items, responses, difficulty, np.clip(discrimination, -1.0, 1.0)
+
+
+def calibrate(cursor, min_responses=QUIZ_CALIBRATION_MIN_RESPONSES):
+    """Estimate every question and write the results to quiz_questions.
+
+    Returns the number of questions updated.
+    """
+    items, responses, difficulty, discrimination = estimate(*load_responses(cursor))
+    keep = responses >= min_responses
+    updates = [
+        (
+            round(float(d), 4),
+            None if np.isnan(r) else round(float(r), 4),
+            int(count),
+            int(question_id)
+        )
+        for question_id, count, d, r in zip(
+            items[keep], responses[keep], difficulty[keep], discrimination[keep]
+        )
+    ]
+    if updates:
+        cursor.executemany("""
+            UPDATE quiz_questions
+            SET difficulty = %s, discrimination = %s,
+                calibration_responses = %s, calibrated_at = UTC_TIMESTAMP()
+            WHERE id = %s
+        """, updates)
+    return len(updates)
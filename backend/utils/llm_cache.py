@@ -0,0 +1,236 @@
+"""Content-addressed cache for chat completions.
+
+Completions are keyed by a SHA-256 of the canonical JSON of
+(model, messages, temperature, response_format) plus every other generation
+parameter (max_tokens, top_p, ...) and kept in
+llm_response_cache for LLM_CACHE_TTL seconds, with a small in-process
+TTLCache in front. Identical requests that arrive while the first one is
+still upstream wait for its answer instead of paying for their own call
+(single flight, per process), for at most LLM_CACHE_FLIGHT_WAIT seconds
+before calling upstream themselves.
+
+Callers pass cache=False when they want a fresh sample; quiz generation
+does so by default (QUIZ_GENERATION_CACHE) because repeated questions
+would only be discarded as duplicates.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from database.db import get_db_connection
+from utils.cache import TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 86400))  # seconds
+LLM_CACHE_LOCAL_SIZE = int(os.getenv('LLM_CACHE_LOCAL_SIZE', 512))
+LLM_CACHE_LOCAL_TTL = int(os.getenv('LLM_CACHE_LOCAL_TTL', 300))  # seconds
+LLM_CACHE_CLEANUP_INTERVAL = int(os.getenv('LLM_CACHE_CLEANUP_INTERVAL', 3600))  # seconds
+LLM_CACHE_FLIGHT_WAIT = float(os.getenv('LLM_CACHE_FLIGHT_WAIT', 120))  # seconds
+
+# Request options that only affect transport, never the completion
+TRANSPORT_OPTIONS = {'extra_headers', 'extra_query', 'timeout'}
+
+
+def cache_key(model, messages, temperature, response_format, **params):
+    canonical = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format,
+            "params": {name: value for name, value in params.items()
+                       if name not in TRANSPORT_OPTIONS}
+        },
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class _Flight:
+    __slots__ = ('done', 'content', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.content = None
+        self.error = None
+
+
+class LLMCache:
+    def __init__(self, ttl=LLM_CACHE_TTL):
+        self.ttl = ttl
+        self._local = TTLCache(maxsize=LLM_CACHE_LOCAL_SIZE, ttl=LLM_CACHE_LOCAL_TTL)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'flight_timeouts': 0,
+            'bypassed': 0,
+            'upstream_calls': 0,
+            'upstream_errors': 0,
+            'store_errors': 0
+        }
+
+    # -- persistent layer -------------------------------------------------------
+
+    def _load(self, key):
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT response FROM llm_response_cache
+                    WHERE cache_key = %s AND expires_at > UTC_TIMESTAMP()
+                """, (key,))
+                row = cursor.fetchone()
+                if row:
+                    cursor.execute("UPDATE llm_response_cache SET hits = hits + 1 WHERE cache_key = %s",
+                                   (key,))
+                return row[0] if row else None
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            # A cache that can't be read is a miss, never a failed request
+            self.counters['store_errors'] += 1
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+
+    def _save(self, key, model, content):
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO llm_response_cache (cache_key, model, response, expires_at)
+                    VALUES (%s, %s, %s, UTC_TIMESTAMP() + INTERVAL %s SECOND)
+                    ON DUPLICATE KEY UPDATE response = VALUES(response),
+                                            expires_at = VALUES(expires_at)
+                """, (key, model, content, self.ttl))
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            self.counters['store_errors'] += 1
+            logger.warning(f"LLM cache write failed: {e}")
+
+    # -- public API -------------------------------------------------------------
+
+    def complete(self, client, model, messages, temperature=None, response_format=None,
+                 cache=True, **kwargs):
+        """Message content of a chat completion, served from cache when possible.
+
+        Returns (content, cached). Extra kwargs are passed upstream and are
+        part of the key, except TRANSPORT_OPTIONS such as extra_headers.
+        """
+        self.counters['requests'] += 1
+
+        def upstream():
+            self.counters['upstream_calls'] += 1
+            try:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    response_format=response_format,
+                    **kwargs
+                )
+            except Exception:
+                self.counters['upstream_errors'] += 1
+                raise
+            return response.choices[0].message.content
+
+        if not cache:
+            self.counters['bypassed'] += 1
+            return upstream(), False
+
+        key = cache_key(model, messages, temperature, response_format, **kwargs)
+        content = self._local.get(key)
+        if content is None:
+            content = self._load(key)
+            if content is not None:
+                self._local.set(key, content)
+        if content is not None:
+            self.counters['hits'] += 1
+            return content, True
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                # A flight that just landed has already filled the local cache
+                content = self._local.get(key)
+                if content is not None:
+                    self.counters['coalesced'] += 1
+                    return content, True
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(LLM_CACHE_FLIGHT_WAIT):
+                # The leader is stuck; don't let it hold every duplicate hostage
+                self.counters['flight_timeouts'] += 1
+                logger.warning(f"LLM cache flight still running after {LLM_CACHE_FLIGHT_WAIT}s, "
+                               f"calling upstream directly")
+                return upstream(), False
+            self.counters['coalesced'] += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.content, True
+
+        self.counters['misses'] += 1
+        try:
+            flight.content = upstream()
+            self._local.set(key, flight.content)
+            self._save(key, model, flight.content)
+            return flight.content, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def cleanup(self, batch_size=1000):
+        """Delete expired entries in small batches (scheduled job)"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        deleted = 0
+        try:
+            while True:
+                cursor.execute("""
+                    DELETE FROM llm_response_cache
+                    WHERE expires_at < UTC_TIMESTAMP()
+                    LIMIT %s
+                """, (batch_size,))
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+                time.sleep(0.05)
+        finally:
+            cursor.close()
+            conn.close()
+        if deleted:
+            logger.info(f"Removed {deleted} expired LLM cache entries")
+
+    def stats(self):
+        stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        saved = stats['hits'] + stats['coalesced']
+        stats['upstream_saved'] = saved
+        stats['hit_ratio'] = round(saved / lookups, 4) if lookups else 0.0
+        stats['local_entries'] = len(self._local)
+        stats['in_flight'] = len(self._flights)
+        return stats
+
+
+llm_cache = LLMCache()
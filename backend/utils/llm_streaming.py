@@ -0,0 +1,111 @@
+"""Relay streamed chat completions to the browser as Server-Sent Events.
+
+Each content delta becomes ``data: {"delta": "..."}``; the stream ends with
+an ``event: done`` (timings) or ``event: error`` message. When the client
+goes away the WSGI server closes our generator, and the upstream stream is
+closed with it, so an abandoned generation stops consuming tokens.
+
+Streamed completions skip the response cache in utils/llm_cache.py.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STREAM_SAMPLE_SIZE = 500
+
+
+def sse(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+
+class StreamStats:
+    """Time-to-first-token and total duration over the last STREAM_SAMPLE_SIZE streams"""
+
+    def __init__(self, sample_size=STREAM_SAMPLE_SIZE):
+        self._ttft_ms = deque(maxlen=sample_size)
+        self._duration_ms = deque(maxlen=sample_size)
+        self._lock = threading.Lock()
+        self.counters = {
+            'started': 0,
+            'completed': 0,
+            'cancelled': 0,
+            'failed': 0
+        }
+
+    def record(self, outcome, ttft_ms, duration_ms):
+        with self._lock:
+            self.counters[outcome] += 1
+            if ttft_ms is not None:
+                self._ttft_ms.append(ttft_ms)
+            if outcome == 'completed':
+                self._duration_ms.append(duration_ms)
+
+    def stats(self):
+        with self._lock:
+            ttft = list(self._ttft_ms)
+            duration = list(self._duration_ms)
+        stats = dict(self.counters)
+        stats.update({
+            'ttft_ms_p50': _percentile(ttft, 0.5),
+            'ttft_ms_p95': _percentile(ttft, 0.95),
+            'duration_ms_p50': _percentile(duration, 0.5),
+            'duration_ms_p95': _percentile(duration, 0.95)
+        })
+        return stats
+
+
+stream_stats = StreamStats()
+
+
+def relay_completion(client, **kwargs):
+    """Generator of SSE messages for client.chat.completions.create(stream=True, **kwargs)"""
+    stream_stats.counters['started'] += 1
+    started = time.perf_counter()
+    ttft_ms = None
+    outcome = 'cancelled'
+    upstream = None
+    try:
+        upstream = client.chat.completions.create(stream=True, **kwargs)
+        for chunk in upstream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            yield sse({"delta": delta})
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        outcome = 'completed'
+        yield sse({
+            "model": kwargs.get('model'),
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+            "duration_ms": round(duration_ms, 1)
+        }, event='done')
+    except GeneratorExit:
+        # Client disconnected; finally closes the upstream stream
+        logger.info("Client disconnected from streamed generation")
+        raise
+    except Exception as e:
+        outcome = 'failed'
+        logger.error(f"Streamed generation failed: {e}")
+        yield sse({"error": "Generation failed", "message": str(e)}, event='error')
+    finally:
+        if upstream is not None:
+            upstream.close()
+        stream_stats.record(outcome, ttft_ms, (time.perf_counter() - started) * 1000)
@@ -0,0 +1,150 @@
+"""Password hashing off the request thread.
+
+scrypt/pbkdf2 are deliberately CPU-heavy and hold the GIL, so hashing and
+verification run in a bounded process pool. When more requests are waiting
+than PASSWORD_HASH_QUEUE allows, callers get PasswordPoolSaturated and
+should answer 503 with the suggested Retry-After instead of queueing.
+
+A job holds its queue slot until the child process finishes it, even when
+the caller gave up after PASSWORD_HASH_TIMEOUT (which is also reported as
+PasswordPoolSaturated), so the queue limit tracks the real load.
+
+Every web worker process owns a pool. PASSWORD_HASH_WORKERS therefore
+defaults to the CPU count divided by WEB_CONCURRENCY (the number of web
+workers, as gunicorn reads it). PASSWORD_HASH_WORKERS=0 hashes inline
+(useful under debuggers/reloaders).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Werkzeug method string: "scrypt:N:r:p" or "pbkdf2:sha256:iterations"
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+WEB_CONCURRENCY = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS',
+                                      max(1, (os.cpu_count() or 2) // WEB_CONCURRENCY)))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', max(PASSWORD_HASH_WORKERS, 1) * 4))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+
+
+class PasswordPoolSaturated(Exception):
+    """Too many hashing jobs are already queued"""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
+
+def is_hashed(value):
+    return value.startswith("scrypt:") or value.startswith("pbkdf2:")
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(hashed_password, password):
+    return check_password_hash(hashed_password, password)
+
+
+class PasswordHasher:
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 queue_depth=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._avg_seconds = 0.05
+        self._current_method = None
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self):
+        # Created lazily, and again after a fork, so each worker owns its pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolSaturated(self.retry_after())
+        started = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                result = fn(*args)
+            finally:
+                self._slots.release()
+        else:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self._slots.release()
+                raise
+            # Freed when the child is done, not when this caller stops waiting
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()  # frees the slot at once if it never started
+                with self._lock:
+                    self.timeouts += 1
+                raise PasswordPoolSaturated(self.retry_after()) from None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._avg_seconds = self._avg_seconds * 0.9 + elapsed * 0.1
+            self.completed += 1
+        return result
+
+    def retry_after(self):
+        """Seconds until a full queue has likely drained, rounded up"""
+        per_worker = self.queue_depth / max(self.workers, 1)
+        return max(1, int(per_worker * self._avg_seconds + 0.999))
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, hashed_password, password):
+        return self._run(_verify, hashed_password, password)
+
+    @property
+    def current_method(self):
+        """Fully parameterised method prefix new hashes are written with"""
+        if self._current_method is None:
+            self._current_method = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return self._current_method
+
+    def needs_rehash(self, hashed_password):
+        """True for plaintext and for hashes made with an older method or cost"""
+        if not is_hashed(hashed_password):
+            return True
+        return hashed_password.split('$', 1)[0] != self.current_method
+
+    def stats(self):
+        return {
+            'method': self.method.split(':')[0],
+            'workers': self.workers,
+            'queue_depth': self.queue_depth,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'avg_ms': round(self._avg_seconds * 1000, 2)
+        }
+
+
+password_hasher = PasswordHasher()
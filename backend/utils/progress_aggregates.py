@@ -0,0 +1,226 @@
+"""Incrementally maintained progress aggregates.
+
+subject_progress_stats      one row per subject (materials, distinct learners/completions)
+student_progress_stats      one row per student (status counters, last activity)
+student_subject_progress    per student and subject breakdown used by the summary view
+
+Writers call these helpers with their own cursor inside the transaction that
+changes user_progress or study_materials, so the aggregates commit or roll back
+together with the base rows. reconcile() rebuilds everything from scratch.
+"""
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMNS = {
+    'To Learn': 'to_learn',
+    'In Progress': 'in_progress',
+    'Completed': 'completed'
+}
+
+
+def _lock_subject(cursor, subject_id):
+    """Serialise writers per subject so the distinct-count probes below are exact"""
+    cursor.execute(
+        "INSERT IGNORE INTO subject_progress_stats (subject_id) VALUES (%s)",
+        (subject_id,)
+    )
+    cursor.execute(
+        "SELECT subject_id FROM subject_progress_stats WHERE subject_id = %s FOR UPDATE",
+        (subject_id,)
+    )
+    cursor.fetchall()
+
+
+def lock_for_progress_change(cursor, subject_id):
+    """Call before touching user_progress for a material in this subject"""
+    if subject_id is not None:
+        _lock_subject(cursor, subject_id)
+
+
+def _exists(cursor, query, params):
+    cursor.execute(query, params)
+    return cursor.fetchone() is not None
+
+
+def apply_progress_change(cursor, user_email, material_id, subject_id, old_status, new_status):
+    """Fold one user_progress transition into the aggregates.
+
+    old_status is None when the progress row was just inserted.
+    """
+    if old_status == new_status:
+        cursor.execute(
+            "UPDATE student_progress_stats SET last_activity = NOW() WHERE user_email = %s",
+            (user_email,)
+        )
+        return
+
+    is_new = old_status is None
+    became_completed = new_status == 'Completed' and old_status != 'Completed'
+    lost_completed = old_status == 'Completed' and new_status != 'Completed'
+
+    # Per student status counters
+    deltas = {column: 0 for column in STATUS_COLUMNS.values()}
+    deltas[STATUS_COLUMNS[new_status]] += 1
+    if not is_new:
+        deltas[STATUS_COLUMNS[old_status]] -= 1
+    cursor.execute("""
+        INSERT INTO student_progress_stats
+        (user_email, materials_accessed, to_learn, in_progress, completed, last_activity)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            materials_accessed = materials_accessed + VALUES(materials_accessed),
+            to_learn = to_learn + VALUES(to_learn),
+            in_progress = in_progress + VALUES(in_progress),
+            completed = completed + VALUES(completed),
+            last_activity = VALUES(last_activity)
+        """, (
+            user_email,
+            1 if is_new else 0,
+            deltas['to_learn'],
+            deltas['in_progress'],
+            deltas['completed']
+        ))
+
+    if subject_id is None:
+        return
+
+    completed_delta = 1 if became_completed else -1 if lost_completed else 0
+    subject = {
+        'accessed_materials': 0,
+        'completed_materials': 0,
+        'active_students': 0,
+        'completions': completed_delta
+    }
+
+    if is_new:
+        cursor.execute("""
+            SELECT materials_accessed FROM student_subject_progress
+            WHERE user_email = %s AND subject_id = %s
+            """, (user_email, subject_id))
+        row = cursor.fetchone()
+        if not row or not _value(row, 'materials_accessed'):
+            subject['active_students'] = 1
+
+        if not _exists(cursor, """
+                SELECT 1 FROM user_progress
+                WHERE material_id = %s AND user_email <> %s LIMIT 1
+                """, (material_id, user_email)):
+            subject['accessed_materials'] = 1
+
+    if completed_delta:
+        completed_by_others = _exists(cursor, """
+            SELECT 1 FROM user_progress
+            WHERE material_id = %s AND status = 'Completed' AND user_email <> %s LIMIT 1
+            """, (material_id, user_email))
+        if not completed_by_others:
+            subject['completed_materials'] = completed_delta
+
+    cursor.execute("""
+        INSERT INTO student_subject_progress
+        (user_email, subject_id, materials_accessed, completed)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            materials_accessed = materials_accessed + VALUES(materials_accessed),
+            completed = completed + VALUES(completed)
+        """, (user_email, subject_id, 1 if is_new else 0, completed_delta))
+
+    cursor.execute("""
+        UPDATE subject_progress_stats
+        SET accessed_materials = accessed_materials + %s,
+            completed_materials = completed_materials + %s,
+            active_students = active_students + %s,
+            completions = completions + %s
+        WHERE subject_id = %s
+        """, (
+            subject['accessed_materials'],
+            subject['completed_materials'],
+            subject['active_students'],
+            subject['completions'],
+            subject_id
+        ))
+
+
+def apply_material_added(cursor, subject_id):
+    """Count a newly uploaded material against its subject"""
+    if subject_id is None:
+        return
+    cursor.execute("""
+        INSERT INTO subject_progress_stats (subject_id, total_materials)
+        VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE total_materials = total_materials + 1
+        """, (subject_id,))
+
+
+def register_student(cursor, user_email):
+    """Give a new student an (empty) row so they show up on the dashboard"""
+    cursor.execute("""
+        INSERT IGNORE INTO student_progress_stats (user_email, last_activity)
+        VALUES (%s, NOW())
+        """, (user_email,))
+
+
+def _value(row, key):
+    return row[key] if isinstance(row, dict) else row[0]
+
+
+def reconcile(cursor):
+    """Rebuild all aggregate tables from user_progress and study_materials.
+
+    Runs inside the caller's transaction; commit afterwards.
+    """
+    cursor.execute("DELETE FROM subject_progress_stats")
+    cursor.execute("""
+        INSERT INTO subject_progress_stats
+        (subject_id, total_materials, accessed_materials, completed_materials,
+         active_students, completions)
+        SELECT
+            s.id,
+            COUNT(DISTINCT sm.id),
+            COUNT(DISTINCT up.material_id),
+            COUNT(DISTINCT CASE WHEN up.status = 'Completed' THEN up.material_id END),
+            COUNT(DISTINCT up.user_email),
+            COALESCE(SUM(CASE WHEN up.status = 'Completed' THEN 1 ELSE 0 END), 0)
+        FROM subjects s
+        LEFT JOIN study_materials sm ON s.id = sm.subject_id
+        LEFT JOIN user_progress up ON sm.id = up.material_id
+        GROUP BY s.id
+    """)
+    subjects = cursor.rowcount
+
+    cursor.execute("DELETE FROM student_subject_progress")
+    cursor.execute("""
+        INSERT INTO student_subject_progress
+        (user_email, subject_id, materials_accessed, completed)
+        SELECT
+            up.user_email,
+            sm.subject_id,
+            COUNT(*),
+            SUM(CASE WHEN up.status = 'Completed' THEN 1 ELSE 0 END)
+        FROM user_progress up
+        JOIN study_materials sm ON up.material_id = sm.id
+        WHERE sm.subject_id IS NOT NULL
+        GROUP BY up.user_email, sm.subject_id
+    """)
+
+    cursor.execute("DELETE FROM student_progress_stats")
+    cursor.execute("""
+        INSERT INTO student_progress_stats
+        (user_email, materials_accessed, to_learn, in_progress, completed, last_activity)
+        SELECT
+            u.email,
+            COUNT(up.id),
+            COALESCE(SUM(CASE WHEN up.status = 'To Learn' THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN up.status = 'In Progress' THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN up.status = 'Completed' THEN 1 ELSE 0 END), 0),
+            COALESCE(MAX(up.updated_at), u.created_at)
+        FROM users u
+        LEFT JOIN user_progress up ON u.email = up.user_email
+        WHERE u.role = 'student'
+        GROUP BY u.email, u.created_at
+    """)
+    students = cursor.rowcount
+
+    logger.info(f"Reconciled progress aggregates for {subjects} subjects and {students} students")
+    return subjects, students
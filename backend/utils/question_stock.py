@@ -0,0 +1,232 @@
+"""Pre-generated AI questions waiting to be handed out, per topic.
+
+quiz_question_stock holds validated questions that have not been served
+yet. /api/quiz/generate moves them into quiz_questions when a topic has
+enough in stock, which answers instantly; only cold topics go through a
+generation job.
+
+Every request counts towards its topic's row in quiz_topic_demand (one
+row per topic and day), whether stock or a job answers it. fill() runs on
+the scheduler. It looks at the topics requested most over the last
+QUIZ_STOCK_LOOKBACK_DAYS (plus QUIZ_STOCK_TOPICS) and tops up every topic
+that has fallen below QUIZ_STOCK_LOW_WATER back to QUIZ_STOCK_TARGET. It
+never generates more than QUIZ_STOCK_HOURLY_BUDGET questions per hour
+across all workers, and holds no database connection while the LLM works.
+"""
+import logging
+import os
+import time
+
+from database.db import get_db_connection
+from utils import quiz_generator
+from utils.cache import invalidate
+from utils.shared_store import SharedStoreError, acquire_lease, get_backend
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUIZ_STOCK_TARGET = int(os.getenv('QUIZ_STOCK_TARGET', 20))
+QUIZ_STOCK_LOW_WATER = int(os.getenv('QUIZ_STOCK_LOW_WATER', 5))
+QUIZ_STOCK_POPULAR_TOPICS = int(os.getenv('QUIZ_STOCK_POPULAR_TOPICS', 10))
+QUIZ_STOCK_LOOKBACK_DAYS = int(os.getenv('QUIZ_STOCK_LOOKBACK_DAYS', 7))
+QUIZ_STOCK_HOURLY_BUDGET = int(os.getenv('QUIZ_STOCK_HOURLY_BUDGET', 100))  # questions
+QUIZ_STOCK_FILL_INTERVAL = int(os.getenv('QUIZ_STOCK_FILL_INTERVAL', 300))  # seconds
+# Topics to keep stocked regardless of demand, comma separated
+QUIZ_STOCK_TOPICS = [t.strip() for t in os.getenv('QUIZ_STOCK_TOPICS', '').split(',') if t.strip()]
+
+STOCK_COLUMNS = "topic, question, option_a, option_b, option_c, option_d, correct_option"
+
+
+class QuestionStock:
+    def __init__(self):
+        self.counters = {
+            'served_requests': 0,
+            'served_questions': 0,
+            'misses': 0,
+            'fill_runs': 0,
+            'stocked_questions': 0,
+            'budget_exhausted': 0
+        }
+
+    def take(self, topic, count):
+        """Move count stocked questions for topic into quiz_questions.
+
+        Returns their column tuples, or None (taking nothing) when the
+        topic has fewer than count in stock. Either way the request counts
+        as demand for the topic.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            self._record_demand(cursor, topic)
+            conn.start_transaction()
+            cursor.execute(f"""
+                SELECT id, {STOCK_COLUMNS} FROM quiz_question_stock
+                WHERE topic = %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (topic, count))
+            rows = cursor.fetchall()
+            if len(rows) < count:
+                conn.rollback()
+                self.counters['misses'] += 1
+                return None
+
+            ids = [row[0] for row in rows]
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"""
+                INSERT INTO quiz_questions ({STOCK_COLUMNS})
+                SELECT {STOCK_COLUMNS} FROM quiz_question_stock
+                WHERE id IN ({placeholders})
+                ORDER BY id
+            """, ids)
+            cursor.execute(f"DELETE FROM quiz_question_stock WHERE id IN ({placeholders})", ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        invalidate('quiz_questions')
+        self.counters['served_requests'] += 1
+        self.counters['served_questions'] += count
+        return [tuple(row[1:]) for row in rows]
+
+    def _record_demand(self, cursor, topic):
+        # Outside the stock transaction: a request counts even when it is refused
+        try:
+            cursor.execute("""
+                INSERT INTO quiz_topic_demand (topic, day, requests)
+                VALUES (%s, UTC_DATE(), 1)
+                ON DUPLICATE KEY UPDATE requests = requests + 1
+            """, (topic,))
+        except Exception as e:
+            logger.warning(f"Could not record demand for {topic}: {e}")
+
+    # -- refill -------------------------------------------------------------
+
+    def topics_to_stock(self, cursor):
+        """Configured topics plus the most requested ones, with their stock level"""
+        cursor.execute("""
+            DELETE FROM quiz_topic_demand WHERE day < UTC_DATE() - INTERVAL %s DAY
+        """, (QUIZ_STOCK_LOOKBACK_DAYS,))
+        cursor.execute("""
+            SELECT topic FROM quiz_topic_demand
+            WHERE day >= UTC_DATE() - INTERVAL %s DAY
+            GROUP BY topic
+            ORDER BY SUM(requests) DESC
+            LIMIT %s
+        """, (QUIZ_STOCK_LOOKBACK_DAYS, QUIZ_STOCK_POPULAR_TOPICS))
+        topics = list(dict.fromkeys(QUIZ_STOCK_TOPICS + [row[0] for row in cursor.fetchall()]))
+        if not topics:
+            return {}
+
+        placeholders = ", ".join(["%s"] * len(topics))
+        cursor.execute(f"""
+            SELECT topic, COUNT(*) FROM quiz_question_stock
+            WHERE topic IN ({placeholders})
+            GROUP BY topic
+        """, topics)
+        levels = dict.fromkeys(topics, 0)
+        levels.update({topic: level for topic, level in cursor.fetchall()})
+        return levels
+
+    def _reserve_budget(self, wanted):
+        """Claim up to wanted questions from this hour's shared budget"""
+        key = f"quiz-stock-budget:{int(time.time() // 3600)}"
+        backend = get_backend()
+        used = backend.incr(key, wanted, ttl=3600)
+        over = used - QUIZ_STOCK_HOURLY_BUDGET
+        if over > 0:
+            refund = min(over, wanted)
+            backend.incr(key, -refund)
+            return wanted - refund
+        return wanted
+
+    def _release_budget(self, unused):
+        if unused <= 0:
+            return
+        try:
+            get_backend().incr(f"quiz-stock-budget:{int(time.time() // 3600)}", -unused)
+        except SharedStoreError as e:
+            logger.warning(f"Could not return unused question stock budget: {e}")
+
+    def _existing(self, topic):
+        """Lower-cased questions already stored or stocked for topic"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT question FROM quiz_questions WHERE topic = %s
+                UNION ALL
+                SELECT question FROM quiz_question_stock WHERE topic = %s
+            """, (topic, topic))
+            return {row[0].strip().lower() for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _store(self, questions):
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(questions))
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"INSERT INTO quiz_question_stock ({STOCK_COLUMNS}) VALUES {placeholders}",
+                           [value for question in questions for value in question])
+        finally:
+            cursor.close()
+            conn.close()
+
+    def fill(self):
+        """Top up topics below the low-water mark (scheduled job)"""
+        if not acquire_lease('quiz-stock-fill', QUIZ_STOCK_FILL_INTERVAL / 2):
+            return
+        self.counters['fill_runs'] += 1
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            levels = self.topics_to_stock(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+        # Each step checks out its own connection; none is held across an LLM call
+        for topic, level in levels.items():
+            if level >= QUIZ_STOCK_LOW_WATER:
+                continue
+            try:
+                wanted = self._reserve_budget(QUIZ_STOCK_TARGET - level)
+            except SharedStoreError as e:
+                logger.warning(f"Question stock budget unavailable: {e}")
+                return
+            if wanted <= 0:
+                self.counters['budget_exhausted'] += 1
+                logger.info("Question stock budget exhausted for this hour")
+                return
+
+            try:
+                questions, _ = quiz_generator.generate_questions(
+                    topic, wanted, exclude=self._existing(topic)
+                )
+            except quiz_generator.GenerationError as e:
+                logger.warning(f"Could not stock {topic}: {e}")
+                self._release_budget(wanted)
+                continue
+            except Exception:
+                self._release_budget(wanted)
+                raise
+            self._release_budget(wanted - len(questions))
+
+            self._store(questions)
+            self.counters['stocked_questions'] += len(questions)
+            logger.info(f"Stocked {len(questions)} {topic} questions (had {level})")
+
+    def stats(self):
+        return dict(self.counters)
+
+
+question_stock = QuestionStock()
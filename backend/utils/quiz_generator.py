@@ -0,0 +1,165 @@
+"""Multiple-choice question generation against an OpenAI-compatible API.
+
+A request for ``count`` questions is split into batches of
+QUIZ_GENERATION_BATCH_SIZE questions per completion. Batches are requested
+concurrently (up to QUIZ_GENERATION_CONCURRENCY at a time). Every question
+is validated with the bulk-import rules, and repeats are dropped, whether
+they repeat within the batch or a question already stored for the topic.
+
+Point LLM_BASE_URL at llm_stub_server.py to exercise this without OpenRouter:
+
+    python llm_stub_server.py --port 8001
+    LLM_BASE_URL=http://localhost:8001/v1 python app.py
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from utils.llm_cache import llm_cache
+from utils.quiz_import import normalize_question
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1')
+QUIZ_MODEL = os.getenv('QUIZ_MODEL', 'deepseek/deepseek-r1-0528:free')
+QUIZ_GENERATION_BATCH_SIZE = int(os.getenv('QUIZ_GENERATION_BATCH_SIZE', 5))
+QUIZ_GENERATION_CONCURRENCY = int(os.getenv('QUIZ_GENERATION_CONCURRENCY', 4))
+QUIZ_GENERATION_MAX_COUNT = int(os.getenv('QUIZ_GENERATION_MAX_COUNT', 50))
+QUIZ_GENERATION_TIMEOUT = float(os.getenv('QUIZ_GENERATION_TIMEOUT', 120))  # seconds per call
+# Cached completions repeat questions we'd discard as duplicates, so off by default
+QUIZ_GENERATION_CACHE = os.getenv('QUIZ_GENERATION_CACHE', 'false').lower() == 'true'
+# Extra rounds to make up for invalid or duplicate questions
+QUIZ_GENERATION_RETRIES = 1
+
+TOKENS_PER_QUESTION = 300
+
+SYSTEM_PROMPT = "Return ONLY valid JSON matching the exact requested format."
+
+client = OpenAI(
+    base_url=LLM_BASE_URL,
+    api_key=os.getenv("OPENROUTER_API_KEY") or "not-needed",
+    timeout=QUIZ_GENERATION_TIMEOUT
+)
+
+
+class GenerationError(Exception):
+    """No usable question could be generated"""
+
+
+def build_prompt(topic, count):
+    return f"""Generate {count} different {topic} multiple-choice quiz questions in strict JSON format:
+        {{
+            "questions": [
+                {{
+                    "question": "Question text?",
+                    "options": {{
+                        "A": "Option A",
+                        "B": "Option B",
+                        "C": "Option C",
+                        "D": "Option D"
+                    }},
+                    "answer": "A"
+                }}
+            ]
+        }}"""
+
+
+def parse_questions(content):
+    """Question objects from a completion; accepts a list, {"questions": [...]} or one question"""
+    data = json.loads(content)
+    if isinstance(data, dict):
+        data = data.get('questions', [data])
+    if not isinstance(data, list):
+        raise ValueError("Completion is not a question list")
+    return data
+
+
+def request_batch(topic, count, temperature, model=QUIZ_MODEL):
+    """One completion asking for count questions; returns the raw question objects"""
+    started = time.perf_counter()
+    content, _ = llm_cache.complete(
+        client,
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(topic, count)}
+        ],
+        response_format={"type": "json_object"},
+        temperature=temperature,
+        cache=QUIZ_GENERATION_CACHE,
+        max_tokens=TOKENS_PER_QUESTION * count
+    )
+    logger.info(f"Generated batch of {count} {topic} questions in "
+                f"{time.perf_counter() - started:.1f}s")
+    return parse_questions(content)
+
+
+def existing_questions(cursor, topic):
+    """Lower-cased question texts already stored for topic"""
+    cursor.execute("SELECT question FROM quiz_questions WHERE topic = %s", (topic,))
+    return {row[0].strip().lower() for row in cursor.fetchall()}
+
+
+def generate_questions(topic, count, temperature=0.7, exclude=(), model=QUIZ_MODEL):
+    """Generate up to count validated, distinct questions for topic.
+
+    Returns (questions, rejected) where questions are quiz_questions column
+    tuples and rejected counts invalid, duplicate or failed outputs.
+    """
+    seen = set(exclude)
+    questions = []
+    rejected = 0
+
+    with ThreadPoolExecutor(max_workers=QUIZ_GENERATION_CONCURRENCY) as pool:
+        for _ in range(1 + QUIZ_GENERATION_RETRIES):
+            missing = count - len(questions)
+            if missing <= 0:
+                break
+            sizes = [min(QUIZ_GENERATION_BATCH_SIZE, missing - start)
+                     for start in range(0, missing, QUIZ_GENERATION_BATCH_SIZE)]
+            futures = [pool.submit(request_batch, topic, size, temperature, model)
+                       for size in sizes]
+
+            for size, future in zip(sizes, futures):
+                try:
+                    batch = future.result()
+                except Exception as e:
+                    logger.error(f"Question batch for {topic} failed: {e}")
+                    rejected += size
+                    continue
+                for raw in batch:
+                    if isinstance(raw, dict):
+                        raw = {**raw, 'topic': topic}
+                    try:
+                        question = normalize_question(raw, topic)
+                    except ValueError as e:
+                        logger.warning(f"Discarding invalid generated question: {e}")
+                        rejected += 1
+                        continue
+                    key = question[1].lower()
+                    if key in seen or len(questions) >= count:
+                        rejected += 1
+                        continue
+                    seen.add(key)
+                    questions.append(question)
+
+    if not questions:
+        raise GenerationError(f"No valid questions generated for {topic}")
+    return questions, rejected
+
+
+def to_generated_shape(question):
+    """Column tuple -> {"question", "options", "answer"} as returned by the API"""
+    topic, text, option_a, option_b, option_c, option_d, answer = question
+    return {
+        "topic": topic,
+        "question": text,
+        "options": {"A": option_a, "B": option_b, "C": option_c, "D": option_d},
+        "answer": answer
+    }
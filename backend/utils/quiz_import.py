@@ -0,0 +1,176 @@
+"""Parsing and validation for bulk quiz question imports.
+
+Accepted payloads for POST /api/quiz/add/bulk:
+
+* JSON: a list of questions, or {"topic": ..., "questions": [...]}
+* CSV with a header row (topic, question, option_a..option_d, correct_option)
+* JSONL: one question object per line
+
+CSV/JSONL may be sent as the request body (text/csv, application/x-ndjson)
+or as a multipart upload in the ``file`` field. Each question may use the
+stored column names or the generator's shape
+``{"question", "options": {"A".."D"}, "answer"}``.
+"""
+import csv
+import io
+import json
+import os
+
+QUIZ_IMPORT_MAX_ROWS = int(os.getenv('QUIZ_IMPORT_MAX_ROWS', 10000))
+
+QUESTION_COLUMNS = ('topic', 'question', 'option_a', 'option_b', 'option_c', 'option_d',
+                    'correct_option')
+OPTION_KEYS = ('A', 'B', 'C', 'D')
+TOPIC_MAX_LENGTH = 100  # quiz_questions.topic is VARCHAR(100)
+
+CSV_TYPES = ('text/csv', 'application/csv')
+JSONL_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+
+class QuizImportError(ValueError):
+    """The payload as a whole could not be read"""
+
+
+def _format_of(filename, mimetype, requested=None):
+    if requested:
+        return requested.lower()
+    name = (filename or '').lower()
+    if name.endswith('.csv') or mimetype in CSV_TYPES:
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or mimetype in JSONL_TYPES:
+        return 'jsonl'
+    return 'json'
+
+
+def _parse_text(text, fmt):
+    """Returns (default_topic, [(row_number, raw)], [row errors])"""
+    errors = []
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise QuizImportError("CSV payload has no header row")
+        # Row 1 is the header
+        return None, [(number, row) for number, row in enumerate(reader, start=2)], errors
+
+    if fmt == 'jsonl':
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append((number, json.loads(line)))
+            except json.JSONDecodeError as e:
+                errors.append({"row": number, "error": f"Invalid JSON: {e.msg}"})
+        return None, rows, errors
+
+    if fmt != 'json':
+        raise QuizImportError(f"Unsupported format: {fmt}")
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise QuizImportError(f"Invalid JSON: {e.msg}")
+    return _parse_json(payload)
+
+
+def _parse_json(payload):
+    default_topic = None
+    if isinstance(payload, dict):
+        default_topic = payload.get('topic')
+        payload = payload.get('questions')
+    if not isinstance(payload, list):
+        raise QuizImportError("Expected a list of questions or {\"questions\": [...]}")
+    return default_topic, list(enumerate(payload, start=1)), []
+
+
+def read_payload(request):
+    """Read the questions from a Flask request"""
+    requested = request.args.get('format')
+    upload = request.files.get('file')
+    if upload is not None:
+        fmt = _format_of(upload.filename, upload.mimetype, requested)
+        try:
+            text = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise QuizImportError("Uploaded file must be UTF-8 text")
+        default_topic, rows, errors = _parse_text(text, fmt)
+        return request.form.get('topic') or default_topic, rows, errors
+
+    if request.is_json and not requested:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            raise QuizImportError("Invalid JSON body")
+        default_topic, rows, errors = _parse_json(payload)
+    else:
+        fmt = _format_of(None, request.mimetype, requested)
+        default_topic, rows, errors = _parse_text(request.get_data(as_text=True), fmt)
+    return request.args.get('topic') or default_topic, rows, errors
+
+
+def _text(raw, key):
+    value = raw.get(key)
+    if value is None:
+        return ''
+    if not isinstance(value, (str, int, float)):
+        raise ValueError(f"Field {key} must be text")
+    return str(value).strip()
+
+
+def normalize_question(raw, default_topic=None):
+    """Validate one question and return it as a QUESTION_COLUMNS tuple"""
+    if not isinstance(raw, dict):
+        raise ValueError("Question must be an object")
+
+    options = raw.get('options')
+    if isinstance(options, dict):
+        # Generator shape: {"question", "options": {"A": ..}, "answer"}
+        option_texts = [_text(options, key) for key in OPTION_KEYS]
+        answer = _text(raw, 'answer')
+    else:
+        option_texts = [_text(raw, f"option_{key.lower()}") for key in OPTION_KEYS]
+        answer = _text(raw, 'correct_option') or _text(raw, 'answer')
+
+    topic = _text(raw, 'topic') or (default_topic or '').strip()
+    question = _text(raw, 'question')
+    answer = answer.upper()
+
+    if not topic:
+        raise ValueError("Missing required field: topic")
+    if len(topic) > TOPIC_MAX_LENGTH:
+        raise ValueError(f"Topic longer than {TOPIC_MAX_LENGTH} characters")
+    if not question:
+        raise ValueError("Missing required field: question")
+    for key, text in zip(OPTION_KEYS, option_texts):
+        if not text:
+            raise ValueError(f"Missing option {key}")
+    if answer not in OPTION_KEYS:
+        raise ValueError("correct_option must be A, B, C, or D")
+
+    return (topic, question, *option_texts, answer)
+
+
+def validate(rows, default_topic=None, errors=None):
+    """Split rows into insertable tuples and per-row errors.
+
+    Repeats of a (topic, question) pair within the payload are rejected.
+    """
+    errors = list(errors or [])
+    valid = []
+    seen = {}
+    if len(rows) + len(errors) > QUIZ_IMPORT_MAX_ROWS:
+        raise QuizImportError(f"At most {QUIZ_IMPORT_MAX_ROWS} questions per import")
+
+    for number, raw in rows:
+        try:
+            question = normalize_question(raw, default_topic)
+        except ValueError as e:
+            errors.append({"row": number, "error": str(e)})
+            continue
+        key = (question[0].lower(), question[1].lower())
+        if key in seen:
+            errors.append({"row": number, "error": f"Duplicate of row {seen[key]}"})
+            continue
+        seen[key] = number
+        valid.append(question)
+
+    errors.sort(key=lambda error: error['row'])
+    return valid, errors
@@ -0,0 +1,326 @@
+"""Background quiz generation jobs persisted in quiz_generation_jobs.
+
+POST /api/quiz/generate only records a job and returns its id; a small pool
+of worker threads in every app process claims queued jobs with
+``FOR UPDATE SKIP LOCKED``, so several processes can drain the same table
+without handing a job out twice. Limits:
+
+* QUIZ_JOB_WORKERS threads per process run generations
+* QUIZ_JOBS_PER_OWNER jobs may be queued or running per caller
+* QUIZ_JOBS_RUNNING_PER_OWNER of those run at the same time
+
+Jobs survive restarts: queued rows are simply picked up again, and running
+rows whose heartbeat went stale (their worker died) are re-queued by
+recover_stale_jobs(), which app.py schedules.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from database.db import get_db_connection
+from models.quiz import Quiz
+from utils import quiz_generator
+from utils.cache import invalidate
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUIZ_JOB_WORKERS = int(os.getenv('QUIZ_JOB_WORKERS', 2))
+QUIZ_JOBS_PER_OWNER = int(os.getenv('QUIZ_JOBS_PER_OWNER', 5))
+QUIZ_JOBS_RUNNING_PER_OWNER = int(os.getenv('QUIZ_JOBS_RUNNING_PER_OWNER', 1))
+QUIZ_JOB_POLL_INTERVAL = float(os.getenv('QUIZ_JOB_POLL_INTERVAL', 2))  # seconds
+QUIZ_JOB_STALE_AFTER = int(os.getenv('QUIZ_JOB_STALE_AFTER', 600))  # seconds without heartbeat
+QUIZ_JOB_MAX_ATTEMPTS = int(os.getenv('QUIZ_JOB_MAX_ATTEMPTS', 3))
+QUIZ_JOB_RETENTION_DAYS = int(os.getenv('QUIZ_JOB_RETENTION_DAYS', 7))
+
+JOB_COLUMNS = """id, owner, topic, requested_count, temperature, status, attempts,
+                 result, error, created_at, started_at, finished_at"""
+
+
+class JobLimitExceeded(Exception):
+    """The caller already has QUIZ_JOBS_PER_OWNER unfinished jobs"""
+
+
+def _job_dict(row):
+    job = {
+        "job_id": row['id'],
+        "status": row['status'],
+        "topic": row['topic'],
+        "count": row['requested_count'],
+        "attempts": row['attempts'],
+        "created_at": row['created_at'].isoformat() if row['created_at'] else None,
+        "started_at": row['started_at'].isoformat() if row['started_at'] else None,
+        "finished_at": row['finished_at'].isoformat() if row['finished_at'] else None
+    }
+    if row['result']:
+        job["result"] = json.loads(row['result'])
+    if row['error']:
+        job["error"] = row['error']
+    return job
+
+
+class QuizJobQueue:
+    def __init__(self, workers=QUIZ_JOB_WORKERS):
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self.app = None
+        self.counters = {
+            'submitted': 0,
+            'rejected': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'requeued': 0,
+            'running': 0
+        }
+
+    # -- API side ---------------------------------------------------------------
+
+    def submit(self, owner, topic, count, temperature):
+        """Record a queued job and return its id"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            # Lock the owner's unfinished jobs so two submits can't both pass the cap
+            cursor.execute("""
+                SELECT id FROM quiz_generation_jobs
+                WHERE owner = %s AND status IN ('queued', 'running')
+                FOR UPDATE
+            """, (owner,))
+            if len(cursor.fetchall()) >= QUIZ_JOBS_PER_OWNER:
+                conn.rollback()
+                self.counters['rejected'] += 1
+                raise JobLimitExceeded(f"At most {QUIZ_JOBS_PER_OWNER} generation jobs at a time")
+
+            job_id = uuid.uuid4().hex
+            cursor.execute("""
+                INSERT INTO quiz_generation_jobs (id, owner, topic, requested_count, temperature)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (job_id, owner, topic, count, temperature))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        self.counters['submitted'] += 1
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"SELECT {JOB_COLUMNS} FROM quiz_generation_jobs WHERE id = %s",
+                           (job_id,))
+            row = cursor.fetchone()
+            return _job_dict(row) if row else None
+        finally:
+            cursor.close()
+            conn.close()
+
+    # -- worker side ------------------------------------------------------------
+
+    def start(self, app):
+        """Start the worker threads for this process (idempotent)"""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return self
+            self.app = app
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"quiz-job-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.workers} quiz generation workers")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    job = self._claim()
+                    if job is not None:
+                        self._run(job)
+                        continue
+            except Exception as e:
+                logger.error(f"Quiz job worker error: {e}", exc_info=True)
+            self._wakeup.wait(QUIZ_JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def _claim(self):
+        """Mark the oldest runnable job as ours; None when there is nothing to do"""
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            cursor.execute("""
+                SELECT j.id, j.owner, j.topic, j.requested_count, j.temperature
+                FROM quiz_generation_jobs j
+                WHERE j.status = 'queued'
+                  AND (SELECT COUNT(*) FROM quiz_generation_jobs r
+                       WHERE r.owner = j.owner AND r.status = 'running') < %s
+                ORDER BY j.created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """, (QUIZ_JOBS_RUNNING_PER_OWNER,))
+            job = cursor.fetchone()
+            if job is None:
+                conn.rollback()
+                return None
+
+            # The count above cannot see another worker's uncommitted claim for
+            # the same owner, so claims are serialised per owner and re-counted
+            owner_lock = "quiz-job-owner:" + hashlib.sha1(job['owner'].encode()).hexdigest()
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (owner_lock,))
+            if not cursor.fetchone()['acquired']:
+                conn.rollback()
+                return None
+            try:
+                # A locking read sees the latest committed rows, not our snapshot
+                cursor.execute("""
+                    SELECT COUNT(*) AS running FROM quiz_generation_jobs
+                    WHERE owner = %s AND status = 'running'
+                    FOR SHARE
+                """, (job['owner'],))
+                if cursor.fetchone()['running'] >= QUIZ_JOBS_RUNNING_PER_OWNER:
+                    conn.rollback()
+                    return None
+                cursor.execute("""
+                    UPDATE quiz_generation_jobs
+                    SET status = 'running', attempts = attempts + 1, locked_by = %s,
+                        started_at = UTC_TIMESTAMP(), heartbeat_at = UTC_TIMESTAMP()
+                    WHERE id = %s
+                """, (self.worker_id, job['id']))
+                conn.commit()
+                return job
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (owner_lock,))
+                cursor.fetchall()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE quiz_generation_jobs
+                SET status = %s, result = %s, error = %s, finished_at = UTC_TIMESTAMP()
+                WHERE id = %s AND locked_by = %s
+            """, (status, json.dumps(result) if result is not None else None, error,
+                  job_id, self.worker_id))
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _heartbeat(self, job_id, done):
+        """Keep a long generation from looking abandoned to recover_stale_jobs()"""
+        while not done.wait(QUIZ_JOB_STALE_AFTER / 3):
+            try:
+                with self.app.app_context():
+                    conn = get_db_connection()
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute("""
+                            UPDATE quiz_generation_jobs SET heartbeat_at = UTC_TIMESTAMP()
+                            WHERE id = %s AND locked_by = %s
+                        """, (job_id, self.worker_id))
+                    finally:
+                        cursor.close()
+                        conn.close()
+            except Exception as e:
+                logger.warning(f"Heartbeat for quiz job {job_id} failed: {e}")
+
+    def _run(self, job):
+        self.counters['running'] += 1
+        started = time.perf_counter()
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job['id'], done), daemon=True).start()
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                existing = quiz_generator.existing_questions(cursor, job['topic'])
+            finally:
+                cursor.close()
+                conn.close()
+
+            questions, rejected = quiz_generator.generate_questions(
+                job['topic'], job['requested_count'], job['temperature'], exclude=existing
+            )
+            Quiz.add_questions(questions)
+            invalidate('quiz_questions')
+
+            self._finish(job['id'], 'succeeded', result={
+                "data": [quiz_generator.to_generated_shape(q) for q in questions],
+                "generated": len(questions),
+                "rejected": rejected,
+                "model": quiz_generator.QUIZ_MODEL
+            })
+            self.counters['succeeded'] += 1
+            logger.info(f"Quiz job {job['id']} generated {len(questions)} questions "
+                        f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Quiz job {job['id']} failed: {e}")
+            self._finish(job['id'], 'failed', error=str(e))
+            self.counters['failed'] += 1
+        finally:
+            done.set()
+            self.counters['running'] -= 1
+
+    # -- maintenance ------------------------------------------------------------
+
+    def recover_stale_jobs(self):
+        """Re-queue jobs whose worker disappeared; give up after QUIZ_JOB_MAX_ATTEMPTS"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE quiz_generation_jobs
+                SET status = IF(attempts >= %s, 'failed', 'queued'),
+                    error = IF(attempts >= %s, 'Worker stopped responding', NULL),
+                    finished_at = IF(attempts >= %s, UTC_TIMESTAMP(), NULL),
+                    locked_by = NULL
+                WHERE status = 'running'
+                  AND heartbeat_at < UTC_TIMESTAMP() - INTERVAL %s SECOND
+            """, (QUIZ_JOB_MAX_ATTEMPTS, QUIZ_JOB_MAX_ATTEMPTS, QUIZ_JOB_MAX_ATTEMPTS,
+                  QUIZ_JOB_STALE_AFTER))
+            if cursor.rowcount:
+                self.counters['requeued'] += cursor.rowcount
+                logger.warning(f"Recovered {cursor.rowcount} stale quiz generation jobs")
+                self._wakeup.set()
+
+            cursor.execute("""
+                DELETE FROM quiz_generation_jobs
+                WHERE status IN ('succeeded', 'failed')
+                  AND finished_at < UTC_TIMESTAMP() - INTERVAL %s DAY
+                LIMIT 1000
+            """, (QUIZ_JOB_RETENTION_DAYS,))
+        finally:
+            cursor.close()
+            conn.close()
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['workers'] = self.workers
+        return stats
+
+
+quiz_jobs = QuizJobQueue()
@@ -0,0 +1,30 @@
+"""Per-answer log of quiz submissions.
+
+quiz_responses is append-only with one narrow row per answered question:
+(result_id, question_id, selected, is_correct). submit_quiz writes it with
+its own cursor in the transaction that inserts into quiz_results; the only
+reader is the calibration job (utils/item_calibration.py).
+"""
+
+OPTIONS = ('A', 'B', 'C', 'D')
+
+
+def record(cursor, result_id, answers, checked):
+    """Log a graded submission; checked is AnswerKeyStore.check()'s output"""
+    rows = []
+    for answer, (question_id, is_correct) in zip(answers, checked):
+        if question_id is None:
+            continue
+        selected = answer.get('selected')
+        rows.append((result_id, question_id, selected if selected in OPTIONS else None,
+                     int(is_correct)))
+    if not rows:
+        return 0
+
+    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    # A question answered twice in one submission keeps its first answer
+    cursor.execute(f"""
+        INSERT IGNORE INTO quiz_responses (result_id, question_id, selected, is_correct)
+        VALUES {placeholders}
+    """, [value for row in rows for value in row])
+    return len(rows)
@@ -0,0 +1,238 @@
+"""Sliding-window rate limiting on the shared store.
+
+Every request is charged against each applicable limit, keyed by the
+authenticated user (from the bearer token) or, for anonymous callers, the
+client IP. Counters live in the shared store (CACHE_URL), so all workers see
+the same budget; with memory:// they stay per process.
+
+Each limit keeps one counter per fixed window and estimates the sliding
+window as ``previous * (1 - elapsed_fraction) + current``, which smooths the
+burst a fixed window allows at its boundary for two keys per limit.
+
+    limiter.init_app(app)           # default limits on every route
+    @limiter.limit("100/minute")    # own budget instead of the defaults
+    @limiter.cost(5)                # spends 5 units of the route's default budget
+    @limiter.exempt
+
+Like flask-limiter's default_limits, the defaults apply per route: each view
+has its own counters, so a busy dashboard does not use up quiz generation.
+Counters are read and charged in one round trip to the store.
+"""
+import logging
+import math
+import os
+import re
+import time
+
+import jwt
+from flask import current_app, g, jsonify, request
+
+from utils.shared_store import SharedStoreError, get_backend
+from utils.tokens_utils import token_verifier
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DEFAULTS = os.getenv('RATE_LIMIT_DEFAULTS', '30/minute;50/hour;200/day')
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Budget units charged by the LLM-backed endpoints
+GENERATION_COST = int(os.getenv('RATE_LIMIT_GENERATION_COST', 5))
+
+PERIODS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+_LIMIT_PATTERN = re.compile(r'^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$')
+
+
+class RateLimit:
+    """``amount`` units per ``window`` seconds"""
+
+    __slots__ = ('amount', 'window', 'text')
+
+    def __init__(self, amount, window, text):
+        self.amount = amount
+        self.window = window
+        self.text = text
+
+    @classmethod
+    def parse(cls, spec):
+        """Parse "30/minute", "100 per minute" or "5 per 10 seconds" """
+        match = _LIMIT_PATTERN.match(spec.lower())
+        if not match:
+            raise ValueError(f"Invalid rate limit: {spec!r}")
+        amount, multiples, period = match.groups()
+        window = PERIODS[period] * int(multiples or 1)
+        return cls(int(amount), window, spec.strip())
+
+
+def parse_limits(specs):
+    if isinstance(specs, str):
+        specs = [part for part in re.split(r'[;,]', specs) if part.strip()]
+    return [RateLimit.parse(spec) for spec in specs]
+
+
+def client_identity():
+    """``user:<id>`` for a valid bearer token, otherwise ``ip:<address>``"""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            claims = token_verifier.verify(auth_header.split(' ', 1)[1])
+            return f"user:{claims['user_id']}"
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    return f"ip:{request.remote_addr or 'unknown'}"
+
+
+def _view_name(f):
+    # functools.wraps keeps these, so stacked decorators resolve to the view
+    return f"{f.__module__}.{f.__name__}"
+
+
+class RateLimiter:
+    def __init__(self, defaults=RATE_LIMIT_DEFAULTS, enabled=RATE_LIMIT_ENABLED):
+        self.defaults = parse_limits(defaults)
+        self.enabled = enabled
+        self._routes = {}
+        self._exempt = set()
+        self.counters = {
+            'checked': 0,
+            'rejected': 0,
+            'backend_errors': 0
+        }
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    # -- decorators ------------------------------------------------------------
+
+    def limit(self, specs, cost=1):
+        """Give a view its own budget instead of the defaults, charging cost per call"""
+        limits = parse_limits([specs] if isinstance(specs, str) else specs)
+
+        def decorator(f):
+            self._routes[_view_name(f)] = (limits, cost)
+            return f
+        return decorator
+
+    def cost(self, units):
+        """Charge units per call against the view's default budget"""
+        def decorator(f):
+            self._routes[_view_name(f)] = (None, units)
+            return f
+        return decorator
+
+    def exempt(self, f):
+        self._exempt.add(_view_name(f))
+        return f
+
+    # -- request hooks ---------------------------------------------------------
+
+    def _view_key(self):
+        view = current_app.view_functions.get(request.endpoint)
+        return _view_name(view) if view is not None else None
+
+    def _before_request(self):
+        if not self.enabled or request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        view_key = self._view_key()
+        if view_key is None or view_key in self._exempt:
+            return None
+
+        limits, cost = self._routes.get(view_key, (None, 1))
+        try:
+            allowed, state = self.hit(view_key, client_identity(), limits or self.defaults, cost)
+        except SharedStoreError as e:
+            # Fail open: an unavailable store must not take the API down with it
+            self.counters['backend_errors'] += 1
+            logger.warning(f"Rate limit check skipped: {e}")
+            return None
+
+        g.rate_limit_state = state
+        if allowed:
+            return None
+
+        self.counters['rejected'] += 1
+        response = jsonify({
+            "error": "Rate limit exceeded",
+            "message": f"{state['limit'].text} allowed"
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(state['retry_after'])
+        return response
+
+    def _after_request(self, response):
+        state = g.pop('rate_limit_state', None)
+        if state is not None:
+            response.headers['X-RateLimit-Limit'] = str(state['limit'].amount)
+            response.headers['X-RateLimit-Remaining'] = str(state['remaining'])
+            response.headers['X-RateLimit-Reset'] = str(state['reset'])
+        return response
+
+    # -- counting --------------------------------------------------------------
+
+    def hit(self, scope, identity, limits, cost=1):
+        """Charge cost against every limit; refund and refuse if any is exceeded.
+
+        Returns (allowed, state) where state describes the tightest limit.
+        """
+        self.counters['checked'] += 1
+        backend = get_backend()
+        now = time.time()
+
+        keys = []
+        for limit in limits:
+            window_index = int(now // limit.window)
+            prefix = f"rl:{scope}:{identity}:{limit.window}"
+            keys.append((f"{prefix}:{window_index}", f"{prefix}:{window_index - 1}"))
+
+        previous, current = backend.incr_many(
+            [(current_key, cost, limit.window * 2) for limit, (current_key, _) in zip(limits, keys)],
+            read_keys=[prev_key for _, prev_key in keys]
+        )
+
+        tightest = None
+        allowed = True
+        for limit, used, prev in zip(limits, current, previous):
+            elapsed = (now % limit.window) / limit.window
+            estimate = int(prev or 0) * (1 - elapsed) + used
+            remaining = max(0, int(limit.amount - estimate))
+            reset = int(now - now % limit.window + limit.window)
+            exceeded = estimate > limit.amount
+            if exceeded:
+                allowed = False
+            if tightest is None or exceeded > tightest['exceeded'] or \
+                    (exceeded == tightest['exceeded'] and remaining < tightest['remaining']):
+                tightest = {
+                    'limit': limit,
+                    'remaining': remaining,
+                    'reset': reset,
+                    'exceeded': exceeded,
+                    'retry_after': self._retry_after(limit, int(prev or 0), used, elapsed)
+                }
+
+        if not allowed:
+            # Refused calls should not keep eating the budget
+            backend.incr_many([(current_key, -cost, None) for current_key, _ in keys])
+        return allowed, tightest
+
+    @staticmethod
+    def _retry_after(limit, previous, used, elapsed):
+        """Seconds until the previous window has decayed enough to fit this call"""
+        if previous <= 0 or used > limit.amount:
+            return max(1, math.ceil(limit.window * (1 - elapsed)))
+        needed_fraction = 1 - (limit.amount - used) / previous
+        return max(1, math.ceil((needed_fraction - elapsed) * limit.window))
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['enabled'] = self.enabled
+        stats['defaults'] = [limit.text for limit in self.defaults]
+        return stats
+
+
+limiter = RateLimiter()
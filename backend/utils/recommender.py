@@ -1,7 +1,20 @@
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+import logging
+import threading
 import mysql.connector
 from database.db import get_db_connection
+from utils.cache import tag_versions
+from utils.shared_store import SharedStoreError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fitted model shared by all requests in this process. It is rebuilt only when
+# the 'materials' tag version in the shared store moves, i.e. after an upload
+# on any worker.
+_model = {'version': None, 'materials': [], 'vectorizer': None, 'vectors': None}
+_model_lock = threading.Lock()
 
 def fetch_materials():
     conn = get_db_connection()
@@ -11,11 +24,28 @@ def fetch_materials():
     conn.close()
     return materials
 
+def _get_model():
+    try:
+        version = tag_versions('materials')[0]
+    except SharedStoreError as e:
+        # Keep serving the last fitted model; fit one if there is none yet.
+        # Its version stays None, so it is refitted once the store is back.
+        logger.warning(f"Materials version unavailable, using last fitted model: {e}")
+        version = None
+    with _model_lock:
+        if _model['vectorizer'] is None or (version is not None and _model['version'] != version):
+            materials = fetch_materials()
+            vectorizer = TfidfVectorizer()
+            vectors = vectorizer.fit_transform([m['title'] for m in materials]) if materials else None
+            _model.update(version=version, materials=materials,
+                          vectorizer=vectorizer, vectors=vectors)
+        return _model['materials'], _model['vectorizer'], _model['vectors']
+
 def recommend_materials(query):
-    materials = fetch_materials()
-    titles = [m['title'] for m in materials]
-    vectorizer = TfidfVectorizer()
-    vectors = vectorizer.fit_transform(titles + [query])
-    sim_scores = cosine_similarity(vectors[-1], vectors[:-1])
+    materials, vectorizer, vectors = _get_model()
+    if not materials:
+        return []
+    query_vector = vectorizer.transform([query])
+    sim_scores = cosine_similarity(query_vector, vectors)
     top_indices = sim_scores[0].argsort()[-5:][::-1]
     return [materials[i] for i in top_indices]
@@ -0,0 +1,264 @@
+"""Pure-Python stand-in for the Redis commands the backend relies on.
+
+Run it next to the workers and point CACHE_URL at it:
+
+    python -m utils.resp_server --port 6380
+    CACHE_URL=redis://localhost:6380/0 flask run
+"""
+import argparse
+import logging
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class KeySpace:
+    """Bytes key/value space with millisecond expiry and LRU eviction"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> [value, expires_at or None]
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None, only_if_missing=False):
+        with self._lock:
+            if only_if_missing and self._live(key) is not None:
+                return False
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._data[key] = [value, expires_at]
+            self._data.move_to_end(key)
+            self._evict()
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._live(key) is not None:
+                    del self._data[key]
+                    removed += 1
+            return removed
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                expires_at = time.monotonic() + ttl if ttl else None
+                entry = self._data[key] = [b'0', expires_at]
+                self._evict()
+            try:
+                value = int(entry[0]) + int(amount)
+            except ValueError:
+                raise ValueError("value is not an integer or out of range")
+            entry[0] = str(value).encode()
+            return value
+
+    def expire(self, key, ttl, only_if_unset=False):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None or (only_if_unset and entry[1] is not None):
+                return False
+            entry[1] = time.monotonic() + ttl
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None or entry[1] is None:
+                return None
+            return max(entry[1] - time.monotonic(), 0.0)
+
+    def exists(self, key):
+        with self._lock:
+            return self._live(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """Speaks enough RESP2 for utils.shared_store.RedisBackend"""
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            try:
+                reply = self.server.dispatch(args)
+            except Exception as e:
+                reply = Error(f"ERR {e}")
+            self.wfile.write(encode(reply))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command, e.g. from `telnet`
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = self.rfile.readline()
+            length = int(header[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class Error(str):
+    pass
+
+
+def encode(reply):
+    if isinstance(reply, Error):
+        return b'-' + reply.encode() + b'\r\n'
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, bool):
+        return b':%d\r\n' % int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+' + reply.encode() + b'\r\n'
+    if isinstance(reply, (list, tuple)):
+        return b'*%d\r\n' % len(reply) + b''.join(encode(item) for item in reply)
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, maxsize=100000):
+        super().__init__(address, RESPHandler)
+        self.keys = KeySpace(maxsize=maxsize)
+
+    def dispatch(self, args):
+        if not args:
+            return Error("ERR empty command")
+        command = args[0].decode().upper()
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None:
+            return Error(f"ERR unknown command '{command}'")
+        return handler(*args[1:])
+
+    def cmd_ping(self, *args):
+        return args[0] if args else 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_auth(self, *args):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.keys.get(key)
+
+    def cmd_mget(self, *keys):
+        return [self.keys.get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        ttl = None
+        only_if_missing = False
+        options = [option.upper() if option.isalpha() else option for option in options]
+        i = 0
+        while i < len(options):
+            if options[i] == b'EX':
+                ttl = int(options[i + 1])
+                i += 1
+            elif options[i] == b'PX':
+                ttl = int(options[i + 1]) / 1000.0
+                i += 1
+            elif options[i] == b'NX':
+                only_if_missing = True
+            else:
+                return Error("ERR syntax error")
+            i += 1
+        if self.keys.set(key, value, ttl, only_if_missing):
+            return 'OK'
+        return None
+
+    def cmd_del(self, *keys):
+        return self.keys.delete(*keys)
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self.keys.exists(key))
+
+    def cmd_incr(self, key):
+        return self.keys.incr(key, 1)
+
+    def cmd_incrby(self, key, amount):
+        return self.keys.incr(key, int(amount))
+
+    def cmd_decrby(self, key, amount):
+        return self.keys.incr(key, -int(amount))
+
+    def cmd_expire(self, key, seconds, *flags):
+        return self.keys.expire(key, int(seconds), b'NX' in [f.upper() for f in flags])
+
+    def cmd_pexpire(self, key, millis, *flags):
+        return self.keys.expire(key, int(millis) / 1000.0, b'NX' in [f.upper() for f in flags])
+
+    def cmd_ttl(self, key):
+        if not self.keys.exists(key):
+            return -2
+        remaining = self.keys.ttl(key)
+        return -1 if remaining is None else int(remaining)
+
+    def cmd_pttl(self, key):
+        if not self.keys.exists(key):
+            return -2
+        remaining = self.keys.ttl(key)
+        return -1 if remaining is None else int(remaining * 1000)
+
+    def cmd_flushdb(self, *args):
+        self.keys.clear()
+        return 'OK'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local shared cache/counter server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    parser.add_argument('--maxkeys', type=int, default=100000)
+    args = parser.parse_args()
+
+    server = RESPServer((args.host, args.port), maxsize=args.maxkeys)
+    logger.info(f"Shared store listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import logging
+import random
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class PeriodicJob:
+    """Run fn every interval seconds on a daemon thread inside an app context"""
+
+    def __init__(self, name, interval, fn, app=None, initial_delay=None):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.app = app
+        self.initial_delay = initial_delay
+        self.runs = 0
+        self.failures = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"job-{name}", daemon=True)
+
+    def _loop(self):
+        # Spread workers out so they don't all fire at the same moment
+        delay = self.initial_delay
+        if delay is None:
+            delay = random.uniform(0, self.interval)
+        while not self._stop.wait(delay):
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        self.fn()
+                else:
+                    self.fn()
+                self.runs += 1
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Scheduled job {self.name} failed: {e}", exc_info=True)
+            delay = self.interval
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_error': self.last_error
+        }
+
+
+def run_every(name, interval, fn, app=None, initial_delay=None):
+    """Start fn as a named periodic job once per process"""
+    with _jobs_lock:
+        job = _jobs.get(name)
+        if job is None:
+            job = _jobs[name] = PeriodicJob(name, interval, fn, app, initial_delay).start()
+            logger.info(f"Scheduled job {name} every {interval}s")
+        return job
+
+
+def job_stats():
+    return {name: job.stats() for name, job in _jobs.items()}
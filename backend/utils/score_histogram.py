@@ -0,0 +1,159 @@
+"""Per-topic quiz score distributions for percentile ranking.
+
+Quiz scores are integer percentages, so a topic's distribution is 101
+counters: quiz_score_histogram holds one row per (topic, score).
+submit_quiz calls record() with its own cursor inside the transaction that
+inserts into quiz_results, so the histogram commits or rolls back with the
+result, and drops its cached copy with forget() once committed.
+reconcile() rebuilds the table from quiz_results: init_db runs it while the
+table is empty, and rebuild_score_histograms.py repairs drift later.
+
+Readers get a TopicDistribution with cumulative counts precomputed, so a
+percentile or a quantile is a lookup however many attempts a topic has.
+Distributions are cached per process for QUIZ_SCORE_CACHE_TTL seconds.
+"""
+import logging
+import os
+from bisect import bisect_left
+
+from database.db import get_db_connection
+from utils.cache import TTLCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUIZ_SCORE_CACHE_SIZE = int(os.getenv('QUIZ_SCORE_CACHE_SIZE', 256))
+QUIZ_SCORE_CACHE_TTL = int(os.getenv('QUIZ_SCORE_CACHE_TTL', 60))  # seconds
+
+MAX_SCORE = 100
+
+
+def clamp_score(score):
+    return max(0, min(int(score), MAX_SCORE))
+
+
+def record(cursor, topic, score):
+    """Count one attempt; call in the transaction that stores the result"""
+    cursor.execute("""
+        INSERT INTO quiz_score_histogram (topic, score, attempts)
+        VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE attempts = attempts + 1
+    """, (topic, clamp_score(score)))
+
+
+def reconcile(cursor):
+    """Rebuild every histogram from quiz_results; returns the number of topics"""
+    cursor.execute("DELETE FROM quiz_score_histogram")
+    cursor.execute("""
+        INSERT INTO quiz_score_histogram (topic, score, attempts)
+        SELECT topic, LEAST(GREATEST(score, 0), %s), COUNT(*)
+        FROM quiz_results
+        WHERE topic IS NOT NULL AND score IS NOT NULL
+        GROUP BY topic, LEAST(GREATEST(score, 0), %s)
+    """, (MAX_SCORE, MAX_SCORE))
+    cursor.execute("SELECT COUNT(DISTINCT topic) FROM quiz_score_histogram")
+    return cursor.fetchone()[0]
+
+
+class TopicDistribution:
+    """101 score counters with their running totals"""
+
+    __slots__ = ('counts', 'cumulative', 'total', 'mean', 'stddev')
+
+    def __init__(self, rows):
+        self.counts = [0] * (MAX_SCORE + 1)
+        for score, attempts in rows:
+            self.counts[score] += attempts
+
+        self.cumulative = []
+        running = 0
+        for count in self.counts:
+            running += count
+            self.cumulative.append(running)
+        self.total = running
+
+        if self.total:
+            self.mean = sum(score * count for score, count in enumerate(self.counts)) / self.total
+            variance = sum(count * (score - self.mean) ** 2
+                           for score, count in enumerate(self.counts)) / self.total
+            self.stddev = variance ** 0.5
+        else:
+            self.mean = None
+            self.stddev = None
+
+    def rank(self, score):
+        """Attempts below, at and above score"""
+        score = clamp_score(score)
+        below = self.cumulative[score - 1] if score > 0 else 0
+        at = self.counts[score]
+        return below, at, self.total - below - at
+
+    def percentile(self, score):
+        """Mid-rank percentile: share of attempts below plus half of the ties"""
+        if not self.total:
+            return None
+        below, at, _ = self.rank(score)
+        return 100 * (below + at / 2) / self.total
+
+    def quantile(self, fraction):
+        """Lowest score reached by at least fraction of the attempts"""
+        if not self.total:
+            return None
+        return bisect_left(self.cumulative, max(1, fraction * self.total))
+
+    def stats(self):
+        if not self.total:
+            return {"attempts": 0}
+        return {
+            "attempts": self.total,
+            "mean": round(self.mean, 2),
+            "stddev": round(self.stddev, 2),
+            "min": self.quantile(0),
+            "p25": self.quantile(0.25),
+            "median": self.quantile(0.5),
+            "p75": self.quantile(0.75),
+            "p90": self.quantile(0.9),
+            "max": bisect_left(self.cumulative, self.total)
+        }
+
+
+class ScoreDistributions:
+    def __init__(self):
+        self._cache = TTLCache(maxsize=QUIZ_SCORE_CACHE_SIZE, ttl=QUIZ_SCORE_CACHE_TTL)
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, topic):
+        distribution = self._cache.get(topic)
+        if distribution is not None:
+            self.hits += 1
+            return distribution
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT score, attempts FROM quiz_score_histogram WHERE topic = %s
+            """, (topic,))
+            distribution = TopicDistribution(cursor.fetchall())
+        finally:
+            cursor.close()
+            conn.close()
+        self.loads += 1
+        self._cache.set(topic, distribution)
+        return distribution
+
+    def forget(self, topic):
+        """Drop this process's copy so its next reader sees a new attempt"""
+        self._cache.delete(topic)
+
+    def stats(self):
+        return {
+            'topics': len(self._cache),
+            'hits': self.hits,
+            'loads': self.loads
+        }
+
+
+score_distributions = ScoreDistributions()
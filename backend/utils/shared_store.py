@@ -0,0 +1,311 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# memory:// keeps everything inside the current process. Point this at a
+# redis://host:port/db URL (a real Redis or `python -m utils.resp_server`)
+# to share caches and counters between workers.
+CACHE_URL = os.getenv('CACHE_URL', 'memory://')
+LOCAL_CACHE_SIZE = int(os.getenv('LOCAL_CACHE_SIZE', 10000))
+
+
+class SharedStoreError(Exception):
+    """Raised when the shared store cannot be reached or rejects a command"""
+
+
+class LocalBackend:
+    """In-process stand-in used when no shared server is configured"""
+
+    def __init__(self, maxsize=LOCAL_CACHE_SIZE):
+        from utils.resp_server import KeySpace
+        self._keys = KeySpace(maxsize=maxsize)
+
+    def get(self, key):
+        return self._keys.get(key)
+
+    def get_many(self, keys):
+        return [self._keys.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        self._keys.set(key, _to_bytes(value), ttl)
+
+    def add(self, key, value, ttl=None):
+        return self._keys.set(key, _to_bytes(value), ttl, only_if_missing=True)
+
+    def delete(self, *keys):
+        return self._keys.delete(*keys)
+
+    def incr(self, key, amount=1, ttl=None):
+        return self._keys.incr(key, amount, ttl)
+
+    def incr_many(self, increments, read_keys=()):
+        values = self.get_many(read_keys)
+        return values, [self._keys.incr(key, amount, ttl) for key, amount, ttl in increments]
+
+    def expire(self, key, ttl):
+        return self._keys.expire(key, ttl)
+
+    def ttl(self, key):
+        return self._keys.ttl(key)
+
+    def ping(self):
+        return True
+
+    def flush(self):
+        self._keys.clear()
+
+
+# Commands that are safe to resend after a reply was lost
+READ_ONLY_COMMANDS = {'GET', 'MGET', 'PTTL', 'TTL', 'PING', 'EXISTS'}
+
+
+class RedisBackend:
+    """Minimal Redis protocol (RESP2) client with one socket per thread"""
+
+    def __init__(self, url, timeout=2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # -- connection handling ------------------------------------------------
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._roundtrip([('AUTH', self.password)])
+        if self.db:
+            self._roundtrip([('SELECT', self.db)])
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _roundtrip(self, commands):
+        payload = b''.join(_encode_command(args) for args in commands)
+        self._local.sock.sendall(payload)
+        return [_read_reply(self._local.reader) for _ in commands]
+
+    def pipeline(self, commands):
+        """Send several commands in one round trip and return their replies.
+
+        A failure while connecting or sending is retried once on a fresh
+        connection. Once the payload is out the server may have applied it,
+        so a failure while reading replies is only retried for read-only
+        commands; retrying an INCRBY there could count it twice.
+        """
+        read_only = all(str(args[0]).upper() in READ_ONLY_COMMANDS for args in commands)
+        for attempt in range(2):
+            sent = False
+            try:
+                if getattr(self._local, 'sock', None) is None:
+                    self._connect()
+                self._local.sock.sendall(b''.join(_encode_command(args) for args in commands))
+                sent = True
+                replies = [_read_reply(self._local.reader) for _ in commands]
+                break
+            except (OSError, ConnectionError) as e:
+                self._reset()
+                if attempt or (sent and not read_only):
+                    raise SharedStoreError(f"Shared store unreachable: {e}") from e
+        for reply in replies:
+            if isinstance(reply, SharedStoreError):
+                raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    # -- commands -----------------------------------------------------------
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return self.execute('MGET', *keys)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.execute('SET', key, value, 'PX', int(ttl * 1000))
+        else:
+            self.execute('SET', key, value)
+
+    def add(self, key, value, ttl=None):
+        if ttl:
+            return self.execute('SET', key, value, 'PX', int(ttl * 1000), 'NX') is not None
+        return self.execute('SET', key, value, 'NX') is not None
+
+    def delete(self, *keys):
+        if not keys:
+            return 0
+        return self.execute('DEL', *keys)
+
+    def incr(self, key, amount=1, ttl=None):
+        if not ttl:
+            return self.execute('INCRBY', key, amount)
+        # Create the counter with its expiry first (SET NX leaves an existing
+        # one alone), then count. Works on any Redis; PEXPIRE NX needs 7.0.
+        _, value = self.pipeline([
+            ('SET', key, 0, 'PX', int(ttl * 1000), 'NX'),
+            ('INCRBY', key, amount),
+        ])
+        return value
+
+    def incr_many(self, increments, read_keys=()):
+        """Read read_keys and apply (key, amount, ttl) increments in one round trip.
+
+        Returns (values, counts) in the order given.
+        """
+        commands = [('MGET', *read_keys)] if read_keys else []
+        for key, amount, ttl in increments:
+            if ttl:
+                commands.append(('SET', key, 0, 'PX', int(ttl * 1000), 'NX'))
+            commands.append(('INCRBY', key, amount))
+        replies = self.pipeline(commands)
+        values = replies[0] if read_keys else []
+        counts = [reply for (command, *_), reply in zip(commands, replies) if command == 'INCRBY']
+        return values, counts
+
+    def expire(self, key, ttl):
+        return bool(self.execute('PEXPIRE', key, int(ttl * 1000)))
+
+    def ttl(self, key):
+        remaining = self.execute('PTTL', key)
+        return remaining / 1000.0 if remaining >= 0 else None
+
+    def ping(self):
+        return self.execute('PING') == b'PONG'
+
+    def flush(self):
+        self.execute('FLUSHDB')
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def _encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        data = _to_bytes(arg)
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by shared store")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest
+    if kind == b'-':
+        return SharedStoreError(rest.decode(errors='replace'))
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        count = int(rest)
+        if count < 0:
+            return None
+        return [_read_reply(reader) for _ in range(count)]
+    raise SharedStoreError(f"Unexpected reply from shared store: {line!r}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend selected by CACHE_URL"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if CACHE_URL.startswith(('redis://', 'resp://')):
+                    _backend = RedisBackend(CACHE_URL)
+                    logger.info(f"Using shared store at {_backend.host}:{_backend.port}")
+                else:
+                    _backend = LocalBackend()
+                    logger.info("Using in-process store")
+    return _backend
+
+
+def is_shared():
+    """True when the backend is visible to every worker, not just this process"""
+    return not isinstance(get_backend(), LocalBackend)
+
+
+def set_backend(backend):
+    """Swap the backend, e.g. to point a maintenance script at another store"""
+    global _backend
+    _backend = backend
+
+
+# ======================
+# Version counters
+# ======================
+
+def _version_key(name):
+    return f"ver:{str(name).strip().lower()}"
+
+
+def current_versions(*names):
+    """Return the current version of each named counter.
+
+    Counters start at a random offset so a flushed or restarted store never
+    hands out a version that an older cached value was stamped with.
+    """
+    backend = get_backend()
+    keys = [_version_key(name) for name in names]
+    values = backend.get_many(keys)
+    versions = []
+    for key, value in zip(keys, values):
+        if value is None:
+            backend.add(key, random.getrandbits(48))
+            value = backend.get(key)
+        versions.append(int(value))
+    return tuple(versions)
+
+
+def current_version(name):
+    return current_versions(name)[0]
+
+
+def bump_version(name):
+    current_version(name)
+    return get_backend().incr(_version_key(name))
+
+
+def acquire_lease(name, ttl):
+    """Best-effort cross-worker lock that expires on its own after ttl seconds"""
+    return get_backend().add(f"lease:{name}", f"{os.getpid()}:{time.time()}", ttl)
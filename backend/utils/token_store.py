@@ -0,0 +1,265 @@
+"""Refresh-token revocation store.
+
+The refresh_tokens row stays the source of truth for whether a refresh token
+is live. Revoked JTIs are also recorded in revoked_refresh_tokens and
+mirrored into an in-memory Bloom filter, which lets /api/auth/refresh skip
+that lookup when all of these hold:
+
+- the token carries the REVOCATION_TRACKED_CLAIM, i.e. it was issued after
+  every way of retiring a token started recording a revocation (older
+  tokens may have been replaced or deleted without one);
+- the shared store is shared between workers (not memory://) and answers;
+- the filter has been synced at the current revocation version and is not
+  over capacity;
+- the filter has never seen the JTI.
+
+Anything else goes to MySQL. Writers call publish() after committing a
+revocation, which bumps the shared version; readers reload new revocations
+as soon as they see the version move.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+from utils.shared_store import (SharedStoreError, acquire_lease, bump_version, current_version,
+                                is_shared)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REVOCATION_FILTER_CAPACITY = int(os.getenv('REVOCATION_FILTER_CAPACITY', 100000))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv('REVOCATION_FILTER_ERROR_RATE', 0.01))
+REVOCATION_SYNC_OVERLAP = 100
+TOKEN_CLEANUP_INTERVAL = int(os.getenv('TOKEN_CLEANUP_INTERVAL', 3600))  # seconds
+TOKEN_CLEANUP_BATCH_SIZE = int(os.getenv('TOKEN_CLEANUP_BATCH_SIZE', 500))
+TOKEN_CLEANUP_PAUSE = float(os.getenv('TOKEN_CLEANUP_PAUSE', 0.05))  # seconds between batches
+
+REVOCATION_VERSION = 'revoked_refresh_tokens'
+# Set on refresh tokens issued by create_tokens once revocations are tracked
+REVOCATION_TRACKED_CLAIM = 'rvk'
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class RefreshTokenStore:
+    def __init__(self, capacity=REVOCATION_FILTER_CAPACITY,
+                 error_rate=REVOCATION_FILTER_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._loaded_id = 0
+        self._synced_version = None
+        self.counters = {
+            'checks': 0,
+            'short_circuits': 0,
+            'untracked_tokens': 0,
+            'revocations': 0,
+            'cleanup_runs': 0,
+            'cleanup_batches': 0,
+            'expired_tokens_deleted': 0,
+            'expired_revocations_deleted': 0,
+            'last_cleanup_seconds': 0.0,
+            'last_cleanup_rows_per_second': 0.0,
+            'refresh_tokens_rows': None,
+            'revoked_refresh_tokens_rows': None
+        }
+
+    # -- revocation filter ----------------------------------------------------
+
+    def _sync(self, cursor):
+        """Load revocations published since the last sync.
+
+        Returns False when the filter cannot be trusted right now.
+        """
+        if not is_shared():
+            # Other workers' revocations never reach a process-local store
+            return False
+        try:
+            version = current_version(REVOCATION_VERSION)
+        except SharedStoreError as e:
+            logger.warning(f"Revocation version unavailable: {e}")
+            return False
+        if version == self._synced_version:
+            return True
+
+        # publish() bumps the version after the revocation committed, so the
+        # rows read here include everything up to this version. Re-read a few
+        # ids back: auto-increment ids can commit out of order.
+        cursor.execute("""
+            SELECT id, token_jti FROM revoked_refresh_tokens
+            WHERE id > %s AND expires_at > UTC_TIMESTAMP()
+            ORDER BY id
+        """, (max(self._loaded_id - REVOCATION_SYNC_OVERLAP, 0),))
+        rows = cursor.fetchall()
+        with self._lock:
+            for row in rows:
+                jti = _field(row, 'token_jti', 1)
+                if jti not in self._filter:
+                    self._filter.add(jti)
+                self._loaded_id = max(self._loaded_id, _field(row, 'id', 0))
+            self._synced_version = version
+        return True
+
+    def can_skip_lookup(self, cursor, payload):
+        """True when the refresh token is certainly not revoked.
+
+        False means the caller must check the refresh_tokens row.
+        """
+        self.counters['checks'] += 1
+        if not payload.get(REVOCATION_TRACKED_CLAIM):
+            self.counters['untracked_tokens'] += 1
+            return False
+        with self._lock:
+            saturated = self._filter.count > self.capacity
+        # Saturated filters answer "maybe" too often; cleanup() rebuilds them
+        if saturated or not self._sync(cursor):
+            return False
+        with self._lock:
+            hit = payload['jti'] in self._filter
+        if not hit:
+            self.counters['short_circuits'] += 1
+        return not hit
+
+    def revoke(self, cursor, jti, expires_at):
+        """Record a revocation; commit with the caller's transaction, then publish()"""
+        cursor.execute("""
+            INSERT IGNORE INTO revoked_refresh_tokens (token_jti, expires_at)
+            VALUES (%s, %s)
+        """, (jti, expires_at))
+        with self._lock:
+            self._filter.add(jti)
+        self.counters['revocations'] += 1
+
+    def publish(self):
+        """Tell the other workers about revocations that just committed"""
+        for attempt in range(3):
+            try:
+                bump_version(REVOCATION_VERSION)
+                return
+            except SharedStoreError as e:
+                # Readers stop trusting their filters while the store is down
+                logger.error(f"Failed to announce refresh token revocation: {e}")
+                time.sleep(0.05 * (attempt + 1))
+
+    def _rebuild(self, cursor):
+        """Start a fresh filter once expired revocations have been purged"""
+        fresh = BloomFilter(self.capacity, self.error_rate)
+        cursor.execute("""
+            SELECT id, token_jti FROM revoked_refresh_tokens
+            WHERE expires_at > UTC_TIMESTAMP()
+        """)
+        loaded_id = 0
+        for row in cursor.fetchall():
+            fresh.add(_field(row, 'token_jti', 1))
+            loaded_id = max(loaded_id, _field(row, 'id', 0))
+        with self._lock:
+            self._filter = fresh
+            self._loaded_id = loaded_id
+
+    # -- cleanup --------------------------------------------------------------
+
+    def _delete_expired(self, conn, cursor, table, batch_size, pause):
+        deleted = 0
+        while True:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE expires_at < UTC_TIMESTAMP() LIMIT %s",
+                (batch_size,)
+            )
+            conn.commit()
+            deleted += cursor.rowcount
+            self.counters['cleanup_batches'] += 1
+            if cursor.rowcount < batch_size:
+                return deleted
+            time.sleep(pause)
+
+    def cleanup(self, connect, batch_size=TOKEN_CLEANUP_BATCH_SIZE, pause=TOKEN_CLEANUP_PAUSE):
+        """Delete expired rows in small batches so no statement holds locks for long.
+
+        Runs in every worker: each one rebuilds its own filter once it is
+        over capacity, and whoever holds the lease deletes the expired rows.
+        """
+        with self._lock:
+            saturated = self._filter.count > self.capacity
+        if not acquire_lease('refresh-token-cleanup', TOKEN_CLEANUP_INTERVAL / 2):
+            logger.debug("Refresh token cleanup already running elsewhere")
+            if saturated:
+                conn = connect()
+                cursor = conn.cursor()
+                try:
+                    self._rebuild(cursor)
+                finally:
+                    cursor.close()
+                    conn.close()
+            return
+        started = time.perf_counter()
+        conn = connect()
+        cursor = conn.cursor()
+        try:
+            tokens = self._delete_expired(conn, cursor, 'refresh_tokens', batch_size, pause)
+            revocations = self._delete_expired(conn, cursor, 'revoked_refresh_tokens', batch_size, pause)
+
+            if revocations or saturated:
+                self._rebuild(cursor)
+
+            cursor.execute("""
+                SELECT table_name, table_rows FROM information_schema.tables
+                WHERE table_schema = DATABASE()
+                  AND table_name IN ('refresh_tokens', 'revoked_refresh_tokens')
+            """)
+            for name, rows in cursor.fetchall():
+                self.counters[f'{name}_rows'] = rows
+
+            elapsed = time.perf_counter() - started
+            self.counters['cleanup_runs'] += 1
+            self.counters['expired_tokens_deleted'] += tokens
+            self.counters['expired_revocations_deleted'] += revocations
+            self.counters['last_cleanup_seconds'] = round(elapsed, 3)
+            self.counters['last_cleanup_rows_per_second'] = (
+                round((tokens + revocations) / elapsed, 1) if elapsed else 0.0
+            )
+            logger.info(f"Cleaned up {tokens} expired refresh tokens and "
+                        f"{revocations} expired revocations in {elapsed:.2f}s")
+        finally:
+            cursor.close()
+            conn.close()
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['filter_entries'] = self._filter.count
+        stats['filter_bits'] = self._filter.size
+        return stats
+
+
+def _field(row, key, index):
+    return row[key] if isinstance(row, dict) else row[index]
+
+
+token_store = RefreshTokenStore()
@@ -2,12 +2,75 @@ from functools import wraps
 from flask import request, jsonify, current_app as app
 import jwt
 from datetime import datetime
+import hashlib
 import logging
+import os
+import threading
+import time
+from utils.cache import TTLCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))  # seconds
+
+REQUIRED_CLAIMS = ['exp', 'iat', 'user_id', 'email', 'role']
+
+
+class TokenVerifier:
+    """HS256 verification with a cache of already verified tokens.
+
+    Entries are keyed by the SHA-256 of the token and never outlive the
+    token's own exp claim, so a cached token expires exactly when the
+    signed one would.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.verifications = 0
+        self.verify_seconds = 0.0
+
+    def verify(self, token, secret=None):
+        """Return the decoded claims or raise jwt.InvalidTokenError"""
+        secret = secret or app.config['SECRET_KEY']
+        key = hashlib.sha256(secret.encode() + b'.' + token.encode()).digest()
+
+        claims = self._cache.get(key)
+        if claims is not None:
+            if 'exp' in claims and claims['exp'] <= time.time():
+                self._cache.delete(key)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            return claims
+
+        started = time.perf_counter()
+        claims = jwt.decode(token, secret, algorithms=["HS256"])
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.verifications += 1
+            self.verify_seconds += elapsed
+
+        ttl = self._cache.ttl
+        if 'exp' in claims:
+            ttl = min(ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self._cache.set(key, claims, ttl)
+        return claims
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats['verifications'] = self.verifications
+        stats['avg_verify_ms'] = (
+            round(self.verify_seconds / self.verifications * 1000, 4)
+            if self.verifications else 0.0
+        )
+        return stats
+
+
+token_verifier = TokenVerifier()
+
 def role_required(allowed_roles):
     def decorator(f):
         @wraps(f)
@@ -43,15 +106,10 @@ def role_required(allowed_roles):
 
                 # 3. Token Decoding
                 try:
-                    data = jwt.decode(
-                        token,
-                        app.config['SECRET_KEY'],
-                        algorithms=["HS256"],
-                        options={
-                            'require': ['exp', 'iat', 'user_id', 'email', 'role'],
-                            'verify_exp': True
-                        }
-                    )
+                    data = token_verifier.verify(token)
+                    for claim in REQUIRED_CLAIMS:
+                        if claim not in data:
+                            raise jwt.MissingRequiredClaimError(claim)
                 except jwt.InvalidTokenError as e:
                     logger.warning(f"Token decode failed: {str(e)}")
                     return jsonify({
@@ -86,7 +144,7 @@ def role_required(allowed_roles):
                     'role': data['role']
                 }
 
-                logger.info(f"Authorized access by {data['email']} ({data['role']})")
+                logger.debug(f"Authorized access by {data['email']} ({data['role']})")
                 return f(*args, **kwargs)
 
             except Exception as e:
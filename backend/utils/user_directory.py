@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.shared_store import SharedStoreError, current_version, bump_version
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USER_DIRECTORY_SIZE = int(os.getenv('USER_DIRECTORY_SIZE', 10000))
+USER_DIRECTORY_TTL = int(os.getenv('USER_DIRECTORY_TTL', 300))  # seconds
+
+USER_COLUMNS = "id, name, email, role, avatar, hashed_password"
+
+
+class UserRecord:
+    """Compact cached copy of a users row"""
+
+    __slots__ = ('id', 'name', 'email', 'role', 'avatar', 'hashed_password',
+                 'version', 'expires_at')
+
+    def __init__(self, row, version):
+        self.id = row['id']
+        self.name = row['name']
+        self.email = row['email']
+        self.role = row['role']
+        self.avatar = row.get('avatar')
+        self.hashed_password = row['hashed_password']
+        self.version = version
+        self.expires_at = time.monotonic() + USER_DIRECTORY_TTL
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "email": self.email,
+            "role": self.role
+        }
+
+
+class UserDirectory:
+    """Bounded id/email -> user cache shared by all requests in the process.
+
+    Each user has a version counter in the shared store; writers bump it via
+    invalidate() so every worker drops its copy on the next lookup.
+    """
+
+    def __init__(self, maxsize=USER_DIRECTORY_SIZE):
+        self.maxsize = maxsize
+        self._by_id = OrderedDict()
+        self._email_to_id = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, user_id):
+        try:
+            return current_version(f"user:{user_id}")
+        except SharedStoreError as e:
+            logger.warning(f"User directory version lookup failed: {e}")
+            return None
+
+    def _cached(self, user_id):
+        with self._lock:
+            record = self._by_id.get(user_id)
+        if record is None or record.expires_at < time.monotonic():
+            return None
+        version = self._version(user_id)
+        if version is None or version != record.version:
+            return None
+        with self._lock:
+            if user_id in self._by_id:
+                self._by_id.move_to_end(user_id)
+        return record
+
+    def _load(self, cursor, user_id):
+        # Read the version before the row: if a writer bumps it in between,
+        # the stale copy is stamped with the old version and never served.
+        version = self._version(user_id)
+        cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        record = UserRecord(row, version)
+        if version is None:
+            return record
+        with self._lock:
+            old = self._by_id.pop(record.id, None)
+            if old is not None:
+                self._forget_email(old)
+            self._by_id[record.id] = record
+            self._remember_email(record)
+            while len(self._by_id) > self.maxsize:
+                _, evicted = self._by_id.popitem(last=False)
+                self._forget_email(evicted)
+        return record
+
+    def _remember_email(self, record):
+        key = record.email.lower()
+        self._email_to_id[key] = record.id
+        self._email_to_id.move_to_end(key)
+        while len(self._email_to_id) > self.maxsize:
+            self._email_to_id.popitem(last=False)
+
+    def _forget_email(self, record):
+        key = record.email.lower()
+        if self._email_to_id.get(key) == record.id:
+            del self._email_to_id[key]
+
+    def get_by_id(self, cursor, user_id):
+        """Return the UserRecord for user_id, querying with cursor on a miss"""
+        record = self._cached(user_id)
+        if record is not None:
+            self.hits += 1
+            return record
+        self.misses += 1
+        return self._load(cursor, user_id)
+
+    def get_by_email(self, cursor, email):
+        """Return the UserRecord for email with at most one query.
+
+        A known email costs one versioned load by id. An unknown one is read
+        by email directly; that copy is returned uncached, since its version
+        could only be read after the row, and the next lookup loads it by id.
+        """
+        email = email.lower()
+        with self._lock:
+            user_id = self._email_to_id.get(email)
+        if user_id is not None:
+            record = self._cached(user_id)
+            if record is not None and record.email.lower() == email:
+                self.hits += 1
+                return record
+            self.misses += 1
+            record = self._load(cursor, user_id)
+            if record is not None and record.email.lower() == email:
+                return record
+            # The id now belongs to another email; fall back to the email
+            with self._lock:
+                if self._email_to_id.get(email) == user_id:
+                    del self._email_to_id[email]
+        else:
+            self.misses += 1
+
+        cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE email = %s", (email,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        record = UserRecord(row, None)
+        with self._lock:
+            self._remember_email(record)
+        return record
+
+    def invalidate(self, user_id):
+        with self._lock:
+            record = self._by_id.pop(user_id, None)
+            if record is not None:
+                self._forget_email(record)
+        try:
+            bump_version(f"user:{user_id}")
+        except SharedStoreError as e:
+            logger.error(f"Failed to invalidate user {user_id} across workers: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._by_id),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+user_directory = UserDirectory()
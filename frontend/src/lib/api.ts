@@ -234,6 +234,10 @@ export async function fetchQuizQuestions(topic: string) {
   return apiFetch(`${API_BASE}/api/quiz/questions/${encodeURIComponent(topic)}`);
 }
 
+export async function sampleQuizQuestions(topic: string, n = 10) {
+  return apiFetch(`${API_BASE}/api/quiz/sample/${encodeURIComponent(topic)}?n=${n}`);
+}
+
 export async function submitQuiz(
   userEmail: string,
   topic: string,
@@ -279,6 +283,7 @@ export default {
   getDashboardStats,
   getStudents,
   fetchQuizQuestions,
+  sampleQuizQuestions,
   submitQuiz,
   fetchRecommendations,
   searchYouTube,
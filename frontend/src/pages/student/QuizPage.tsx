@@ -13,7 +13,6 @@ interface ApiQuiz {
   option_b: string;
   option_c: string;
   option_d: string;
-  correct_option: 'A' | 'B' | 'C' | 'D';
 }
 
 const QuizPage = () => {
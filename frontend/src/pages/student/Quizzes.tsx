@@ -22,15 +22,9 @@ interface Quiz {
   score?: number;
 }
 
-interface ApiQuiz {
-  id: number;
+interface ApiQuizTopic {
   topic: string;
-  question: string;
-  option_a: string;
-  option_b: string;
-  option_c: string;
-  option_d: string;
-  correct_option: 'A' | 'B' | 'C' | 'D';
+  questions: number;
 }
 
 interface ApiQuizResult {
@@ -57,35 +51,26 @@ const Quizzes = () => {
       try {
         setError("");
         
-        // Fetch all questions to use as upcoming quizzes
-        const questionsResponse = await axios.get<{ data: ApiQuiz[] }>(
-          "http://localhost:5000/api/quiz/questions",
+        // Question counts per topic become the upcoming quizzes
+        const topicsResponse = await axios.get<{ data: ApiQuizTopic[] }>(
+          "http://localhost:5000/api/quiz/topics",
           {
             headers: {
               'Cache-Control': 'no-cache'
             }
           }
         );
-        
-        if (!questionsResponse.data?.data) {
-          throw new Error("Invalid questions data structure");
+
+        if (!topicsResponse.data?.data) {
+          throw new Error("Invalid topics data structure");
         }
-        
-        // Group questions by topic to create quizzes
-        const questionsByTopic: Record<string, ApiQuiz[]> = {};
-        questionsResponse.data.data.forEach(question => {
-          if (!questionsByTopic[question.topic]) {
-            questionsByTopic[question.topic] = [];
-          }
-          questionsByTopic[question.topic].push(question);
-        });
 
-        // Create upcoming quizzes from the grouped questions
-        const upcomingQuizzes = Object.entries(questionsByTopic).map(([topic, questions]) => ({
+        // Create upcoming quizzes from the topic counts
+        const upcomingQuizzes = topicsResponse.data.data.map(({ topic, questions }) => ({
           id: `topic-${topic}`,
           title: topic,
           subject: "General",
-          questions: questions.length,
+          questions,
           timeLimit: 30,
           dueDate: new Date(Date.now() + 7 * 24 * 60 * 60 * 1000).toISOString(),
           status: "upcoming" as const,
@@ -143,7 +128,10 @@ const Quizzes = () => {
       setError("");
       
       const topic = quizId.replace('topic-', '');
-      const response = await axios.get(`http://localhost:5000/api/quiz/questions/${topic}`);
+      const response = await axios.get(
+        `http://localhost:5000/api/quiz/sample/${encodeURIComponent(topic)}`,
+        { params: { n: 10 } }
+      );
       
       if (!response.data?.data) {
         throw new Error("Invalid questions data structure");
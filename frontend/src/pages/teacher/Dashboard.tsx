@@ -210,8 +210,30 @@ const TeacherDashboard = () => {
         }
       });
 
-      const response = await api.post('http://localhost:5000/api/quiz/generate', { topic: quizTopic });
-      setGeneratedQuestion(response.data.data);
+      // Generation runs as a background job; poll until it finishes
+      const { data: job } = await api.post('http://localhost:5000/api/quiz/generate', { topic: quizTopic });
+      if (job.status === 'succeeded') {
+        // Served from pre-generated stock
+        setGeneratedQuestion(job.data);
+        return;
+      }
+      const deadline = Date.now() + 5 * 60 * 1000;
+      while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const { data: status } = await api.get(`http://localhost:5000/api/quiz/generate/${job.job_id}`);
+        if (status.status === 'succeeded') {
+          // Every generated question can be rejected as malformed or duplicate
+          if (Array.isArray(status.result.data) && status.result.data.length === 0) {
+            throw new Error('No usable questions were generated');
+          }
+          setGeneratedQuestion(status.result.data);
+          return;
+        }
+        if (status.status === 'failed') {
+          throw new Error(status.error || 'Generation failed');
+        }
+      }
+      throw new Error('Generation timed out');
       
     } catch (error) {
       console.error("Error generating question:", error);
@@ -244,11 +266,11 @@ const TeacherDashboard = () => {
         }
       });
 
-      // Save each question to the backend
-      await Promise.all(
-        quizQuestions.map(question => 
-          api.post('/quiz/add', question)
-      ));
+      // Save the whole quiz in one request; nothing is saved if any question is invalid
+      await api.post('/quiz/add/bulk?atomic=true', {
+        topic: quizTopic,
+        questions: quizQuestions
+      });
 
       // Reset form
       setQuizQuestions([]);
@@ -261,7 +283,12 @@ const TeacherDashboard = () => {
       
     } catch (error) {
       console.error("Error saving quiz:", error);
-      setQuizError("Failed to save quiz. Please try again.");
+      const rowErrors = axios.isAxiosError(error) ? error.response?.data?.errors : undefined;
+      if (Array.isArray(rowErrors) && rowErrors.length > 0) {
+        setQuizError(rowErrors.map((e: { row: number; error: string }) => `Question ${e.row}: ${e.error}`).join('; '));
+      } else {
+        setQuizError("Failed to save quiz. Please try again.");
+      }
     }
   };
 